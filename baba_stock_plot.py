@@ -1,14 +1,13 @@
 # Install required libraries if not already installed
 # !pip install yfinance plotly pandas
 
-import yfinance as yf
-import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-import pandas as pd
+from price_store import get_history
+from render_mode import price_traces, line_trace
 
-# Fetch BABA stock data
+# Fetch BABA stock data from the local store (only new bars are downloaded)
 ticker = "BABA"
-stock_data = yf.Ticker(ticker).history(period="1y")
+stock_data = get_history(ticker, period="1y")
 
 # Check if data is available
 if stock_data.empty:
@@ -18,26 +17,23 @@ else:
     stock_data['50_MA'] = stock_data['Close'].rolling(window=50).mean()
     stock_data['200_MA'] = stock_data['Close'].rolling(window=200).mean()
 
-    # Create candlestick chart
+    # Create candlestick chart (GL line-segment OHLC bars for large series)
     fig = make_subplots(rows=1, cols=1)
-    fig.add_trace(go.Candlestick(
-        x=stock_data.index,
-        open=stock_data['Open'],
-        high=stock_data['High'],
-        low=stock_data['Low'],
-        close=stock_data['Close'],
-        name=f"{ticker} Candlestick"
-    ))
+    for trace in price_traces(stock_data.index, stock_data['Open'], stock_data['High'],
+                              stock_data['Low'], stock_data['Close'],
+                              name=f"{ticker} Candlestick",
+                              increasing_color='#3D9970', decreasing_color='#FF4136'):
+        fig.add_trace(trace)
 
     # Add moving averages
-    fig.add_trace(go.Scatter(
+    fig.add_trace(line_trace(
         x=stock_data.index,
         y=stock_data['50_MA'],
         name='50-Day MA',
         line=dict(color='blue', width=1)
     ))
     
-    fig.add_trace(go.Scatter(
+    fig.add_trace(line_trace(
         x=stock_data.index,
         y=stock_data['200_MA'],
         name='200-Day MA',
@@ -0,0 +1,303 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from dotenv import load_dotenv
+from chat_context import count_tokens
+from llm_client import LLMClient, LLM_BASE_URL
+
+# Offline batch runner: streams prompts from a JSONL file through the chat
+# API, a few at a time under request and token rate limits, and appends
+# each result to an output JSONL as soon as it arrives. Running it again
+# with the same files skips every line already answered, so an interrupted
+# batch resumes where it stopped.
+#
+#   python batch_prompts.py requests.jsonl -o replies.jsonl --concurrency 16 --rps 5 --tpm 200000
+#
+# Input lines hold either "messages" (a chat message list) or a prompt text
+# in the first of PROMPT_FIELDS present; the record's ID is the first of
+# ID_FIELDS present. Output lines are
+#   {"line": 12, "id": "user-013", "reply": "...", "usage": {...}, "elapsed": 1.9}
+# or the same with "error" instead of "reply"; failed lines are retried by
+# the next run, so the last record for a line is the one that counts.
+
+DEFAULT_MODEL = 'deepseek-chat'
+ID_FIELDS = ('id', 'custom_id', 'request_id')
+PROMPT_FIELDS = ('prompt', 'body', 'content', 'text')
+
+# Seconds between progress lines on stderr
+PROGRESS_INTERVAL = 5.0
+
+
+class LineSet:
+    """Set of line numbers as a bitmap: one bit per input line"""
+
+    def __init__(self):
+        self.bits = bytearray()
+        self.count = 0
+
+    def add(self, line):
+        byte, bit = divmod(line, 8)
+        if byte >= len(self.bits):
+            self.bits.extend(bytes(byte + 1 - len(self.bits)))
+        if not self.bits[byte] & (1 << bit):
+            self.bits[byte] |= 1 << bit
+            self.count += 1
+
+    def __contains__(self, line):
+        byte, bit = divmod(line, 8)
+        return byte < len(self.bits) and bool(self.bits[byte] & (1 << bit))
+
+    def __len__(self):
+        return self.count
+
+
+class TokenBucket:
+    """rate units per second on average, in bursts of up to capacity"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until amount is available (anything above capacity waits for a full bucket)"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def take(self, amount):
+        # May go negative: the debt is paid off before the next request goes
+        self._refill()
+        self.level -= amount
+
+    def give(self, amount):
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+
+class RateLimiter:
+    """Requests per second and tokens per minute, either of them optional
+
+    Each request reserves its prompt tokens plus max_tokens up front, and
+    settle() returns what the reported usage shows it did not need.
+    """
+
+    def __init__(self, requests_per_second=None, tokens_per_minute=None):
+        self.requests = TokenBucket(requests_per_second, max(1.0, requests_per_second)) if requests_per_second else None
+        self.tokens = TokenBucket(tokens_per_minute / 60, tokens_per_minute) if tokens_per_minute else None
+        self._lock = None
+
+    async def acquire(self, tokens):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # One waiter at a time, so requests are let through in order
+        async with self._lock:
+            while True:
+                wait = max(self.requests.wait_time(1) if self.requests else 0.0,
+                           self.tokens.wait_time(tokens) if self.tokens else 0.0)
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            if self.requests:
+                self.requests.take(1)
+            if self.tokens:
+                self.tokens.take(tokens)
+
+    def settle(self, reserved, used):
+        if self.tokens and used != reserved:
+            if used < reserved:
+                self.tokens.give(reserved - used)
+            else:
+                self.tokens.take(used - reserved)
+
+
+def completed_lines(output_path):
+    """Input lines already answered in output_path
+
+    A record cut short by an interruption is trimmed off the end of the
+    file, so the next run appends after the last complete one.
+    """
+    done = LineSet()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, 'rb+') as f:
+        good_end = 0
+        for raw in f:
+            if not raw.endswith(b'\n'):
+                break
+            try:
+                record = json.loads(raw)
+            except ValueError:
+                break
+            good_end += len(raw)
+            if 'error' not in record:
+                done.add(record['line'])
+        f.truncate(good_end)
+    return done
+
+
+def first_field(record, fields):
+    return next((record[field] for field in fields if record.get(field) is not None), None)
+
+
+def build_request(record, prompt_fields=PROMPT_FIELDS, system=None):
+    """Chat message list for an input record"""
+    if record.get('messages'):
+        messages = list(record['messages'])
+    else:
+        prompt = first_field(record, prompt_fields)
+        if not isinstance(prompt, str) or not prompt.strip():
+            raise ValueError(f"no prompt in any of {', '.join(prompt_fields)}")
+        messages = [{"role": "user", "content": prompt}]
+    if system and messages[0].get('role') != 'system':
+        messages.insert(0, {"role": "system", "content": system})
+    return messages
+
+
+def read_prompts(input_path, done):
+    """(line number, text) for every input line not answered yet, read lazily"""
+    with open(input_path, encoding='utf-8') as f:
+        for line_no, line in enumerate(f):
+            if line.strip() and line_no not in done:
+                yield line_no, line
+
+
+class BatchRunner:
+    def __init__(self, llm, limiter, concurrency=8, model=DEFAULT_MODEL, temperature=0.7, max_tokens=1000,
+                 id_fields=ID_FIELDS, prompt_fields=PROMPT_FIELDS, system=None, progress=True):
+        self.llm = llm
+        self.limiter = limiter
+        self.concurrency = concurrency
+        self.params = dict(model=model, temperature=temperature, max_tokens=max_tokens)
+        self.id_fields = id_fields
+        self.prompt_fields = prompt_fields
+        self.system = system
+        self.progress = progress
+        self.answered = 0
+        self.failed = 0
+        self.tokens = 0
+
+    async def answer(self, line_no, line):
+        """Output record for one input line"""
+        start = time.perf_counter()
+        try:
+            record = json.loads(line)
+            record_id = first_field(record, self.id_fields)
+            messages = build_request(record, self.prompt_fields, self.system)
+        except (ValueError, TypeError, AttributeError) as e:
+            return {'line': line_no, 'id': None, 'error': f"Invalid record: {e}"}
+
+        reserved = sum(count_tokens(m.get('content') or '') for m in messages) + (self.params['max_tokens'] or 0)
+        await self.limiter.acquire(reserved)
+        try:
+            completion = await self.llm.create(messages, **self.params)
+        except Exception as e:
+            self.limiter.settle(reserved, reserved - (self.params['max_tokens'] or 0))
+            return {'line': line_no, 'id': record_id, 'error': str(e),
+                    'elapsed': round(time.perf_counter() - start, 3)}
+
+        usage = completion.usage
+        used = usage.total_tokens if usage else reserved
+        self.limiter.settle(reserved, used)
+        self.tokens += used
+        return {
+            'line': line_no,
+            'id': record_id,
+            'reply': completion.choices[0].message.content,
+            'finish_reason': completion.choices[0].finish_reason,
+            'usage': {'prompt_tokens': usage.prompt_tokens, 'completion_tokens': usage.completion_tokens} if usage else None,
+            'elapsed': round(time.perf_counter() - start, 3)
+        }
+
+    async def _report(self, start, skipped):
+        while True:
+            await asyncio.sleep(PROGRESS_INTERVAL)
+            elapsed = time.monotonic() - start
+            print(f"{self.answered} answered, {self.failed} failed, {skipped} done earlier; "
+                  f"{(self.answered + self.failed) / elapsed:.1f} req/s, "
+                  f"{self.tokens / elapsed * 60:.0f} tokens/min", file=sys.stderr)
+
+    async def run(self, input_path, output_path, limit=None):
+        """Answer every line of input_path missing from output_path; returns counts"""
+        done = completed_lines(output_path)
+        # A bounded queue keeps only a few lines in memory, however long the file
+        pending = asyncio.Queue(maxsize=self.concurrency * 2)
+        start = time.monotonic()
+
+        async def feed():
+            for n, item in enumerate(read_prompts(input_path, done)):
+                if limit is not None and n >= limit:
+                    break
+                await pending.put(item)
+            for _ in range(self.concurrency):
+                await pending.put(None)
+
+        with open(output_path, 'a', encoding='utf-8') as out:
+            async def work():
+                while (item := await pending.get()) is not None:
+                    result = await self.answer(*item)
+                    # One write per record, flushed at once: an interruption loses at most the records in flight
+                    out.write(json.dumps(result, ensure_ascii=False) + '\n')
+                    out.flush()
+                    if 'error' in result:
+                        self.failed += 1
+                    else:
+                        self.answered += 1
+
+            reporter = asyncio.create_task(self._report(start, len(done))) if self.progress else None
+            try:
+                await asyncio.gather(feed(), *(work() for _ in range(self.concurrency)))
+            finally:
+                if reporter:
+                    reporter.cancel()
+
+        return {'answered': self.answered, 'failed': self.failed, 'done_earlier': len(done),
+                'tokens': self.tokens, 'seconds': round(time.monotonic() - start, 2)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run a JSONL file of prompts through the chat API')
+    parser.add_argument('input', help='JSONL file of prompts')
+    parser.add_argument('-o', '--output', help='JSONL file of results (default: INPUT.out.jsonl); resumed if it exists')
+    parser.add_argument('--concurrency', type=int, default=8, help='requests in flight at once')
+    parser.add_argument('--rps', type=float, default=None, help='requests per second limit')
+    parser.add_argument('--tpm', type=int, default=None, help='tokens per minute limit (prompt + completion)')
+    parser.add_argument('--model', default=DEFAULT_MODEL)
+    parser.add_argument('--temperature', type=float, default=0.7)
+    parser.add_argument('--max-tokens', type=int, default=1000)
+    parser.add_argument('--system', default=None, help='system prompt added to every request')
+    parser.add_argument('--id-field', action='append', help=f"record ID field (default: {', '.join(ID_FIELDS)})")
+    parser.add_argument('--prompt-field', action='append',
+                        help=f"prompt text field (default: {', '.join(PROMPT_FIELDS)})")
+    parser.add_argument('--limit', type=int, default=None, help='answer at most this many lines in this run')
+    parser.add_argument('--base-url', default=LLM_BASE_URL)
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    output = args.output or f"{os.path.splitext(args.input)[0]}.out.jsonl"
+    llm = LLMClient(base_url=args.base_url, max_in_flight=args.concurrency, max_connections=args.concurrency)
+    runner = BatchRunner(llm, RateLimiter(args.rps, args.tpm), concurrency=args.concurrency, model=args.model,
+                         temperature=args.temperature, max_tokens=args.max_tokens,
+                         id_fields=tuple(args.id_field or ID_FIELDS),
+                         prompt_fields=tuple(args.prompt_field or PROMPT_FIELDS), system=args.system)
+    try:
+        summary = asyncio.run(runner.run(args.input, output, limit=args.limit))
+    except KeyboardInterrupt:
+        print(f"Interrupted after {runner.answered} answers; run again with the same arguments to resume",
+              file=sys.stderr)
+        return 130
+    print(json.dumps(summary))
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,87 @@
+import sys
+import time
+import json
+import gzip
+import numpy as np
+import pandas as pd
+import plotly
+import stock_visualization as sv
+from downsampling import downsample_view
+from figure_encoding import encode_figure
+
+# Compares what update_graph sends per callback: a full figure versus a
+# Patch of the trace data, and plotly's own JSON versus the compact
+# encoding, raw and gzipped. Uses synthetic daily bars, so no network access is needed.
+BARS = {'1mo': 21, '1y': 252, '5y': 1260}
+
+
+def synthetic_history(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    open_ = close * (1 + rng.normal(0, 0.005, n))
+    return pd.DataFrame({
+        'Open': open_,
+        'High': np.maximum(open_, close) * 1.01,
+        'Low': np.minimum(open_, close) * 0.99,
+        'Close': close,
+        'Volume': rng.integers(1e6, 1e7, n)
+    }, index=pd.bdate_range(end='2025-01-31', periods=n, tz='America/New_York'))
+
+
+def encode(obj):
+    """Serialize a callback output the way Dash does"""
+    return json.dumps(obj, cls=plotly.utils.PlotlyJSONEncoder)
+
+
+def measure(build, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        payload = encode(build())
+    return (time.perf_counter() - start) / repeats * 1000, payload
+
+
+def run(repeats=20):
+    print(f"{'period':<8}{'full ms':>10}{'patch ms':>10}{'full KB':>10}{'full gz':>10}{'patch KB':>10}{'patch gz':>10}")
+    for period, n in BARS.items():
+        candles, lines = standard_view(n)
+        full_ms, full = measure(
+            lambda: encode_figure(sv.build_figure('AAPL', sv.build_traces(candles, lines))),
+            repeats)
+        patch_ms, patch = measure(
+            lambda: sv.patch_figure('AAPL', sv.build_traces(candles, lines)), repeats)
+        (full_kb, full_gz), (patch_kb, patch_gz) = sizes_of(full), sizes_of(patch)
+        print(f"{period:<8}{full_ms:>10.1f}{patch_ms:>10.1f}{full_kb:>10.1f}{full_gz:>10.1f}"
+              f"{patch_kb:>10.1f}{patch_gz:>10.1f}")
+
+
+def standard_view(n):
+    """Candles and indicator lines as update_graph sends them for n daily bars"""
+    hist = synthetic_history(n)
+    rsi = sv.calculate_rsi(hist)
+    ma20, ma60, ma200 = sv.calculate_moving_averages(hist)
+    return downsample_view(hist, {'20 MA': ma20, '60 MA': ma60, '200 MA': ma200, 'RSI': rsi})
+
+
+def sizes_of(payload):
+    """(raw KB, gzipped KB) of a serialized callback output"""
+    payload = payload.encode('utf-8')
+    return len(payload) / 1024, len(gzip.compress(payload, compresslevel=6)) / 1024
+
+
+def sizes(obj):
+    return sizes_of(encode(obj))
+
+
+def run_encoding():
+    print(f"{'figure':<12}{'plain KB':>10}{'compact KB':>12}{'plain gz':>10}{'compact gz':>12}")
+    for period, n in BARS.items():
+        candles, lines = standard_view(n)
+        fig = sv.build_figure('AAPL', sv.build_traces(candles, lines))
+        plain_kb, plain_gz = sizes(fig)
+        compact_kb, compact_gz = sizes(encode_figure(fig))
+        print(f"{period + ' full':<12}{plain_kb:>10.1f}{compact_kb:>12.1f}{plain_gz:>10.1f}{compact_gz:>12.1f}")
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
+    print()
+    run_encoding()
@@ -0,0 +1,58 @@
+import sys
+import time
+import json
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+import plotly
+import live_feed
+import stock_visualization as sv
+from bench_figure_payload import synthetic_history
+
+# Load test for live mode: many sessions replaying synthetic bars as fast
+# as they can be polled, timing what one stream_bars call costs the
+# server (loading and storing the session, poll, incremental indicators,
+# JSON encoding). No network access.
+
+
+def poll_once(session_id):
+    start = time.perf_counter()
+    bars, lines = live_feed.poll_session(session_id)
+    if bars.empty:
+        return None
+    x = list(bars.index)
+    payload = json.dumps([
+        {'x': [x], 'open': [bars['Open'].tolist()], 'high': [bars['High'].tolist()],
+         'low': [bars['Low'].tolist()], 'close': [bars['Close'].tolist()]},
+        {'x': [x] * len(sv.LINE_NAMES), 'y': [lines[name].tolist() for name in sv.LINE_NAMES]}
+    ], cls=plotly.utils.PlotlyJSONEncoder)
+    return (time.perf_counter() - start) * 1000, len(payload)
+
+
+def run(sessions=50, bars=2000, speed=200.0, duration=5.0):
+    hist = synthetic_history(bars)
+    feeds = [live_feed.ReplayFeed('BENCH', bars=hist, replay_bars=bars - live_feed.LIVE_WINDOW, speed=speed)
+             for _ in range(sessions)]
+    ids = [live_feed.start_session('BENCH', feed=feed)[0] for feed in feeds]
+
+    timings = []
+    deadline = time.monotonic() + duration
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        while time.monotonic() < deadline:
+            results = pool.map(poll_once, ids)
+            timings.extend(result for result in results if result is not None)
+            time.sleep(0.05)
+
+    for sid in ids:
+        live_feed.stop_session(sid)
+    if not timings:
+        print("No bars were replayed")
+        return
+    ms = [t for t, _ in timings]
+    size = [b for _, b in timings]
+    print(f"sessions={sessions} polls with bars={len(timings)}")
+    print(f"poll ms: mean {statistics.fmean(ms):.2f}  median {statistics.median(ms):.2f}  max {max(ms):.2f}")
+    print(f"payload bytes: mean {statistics.fmean(size):.0f}  max {max(size)}")
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
@@ -0,0 +1,77 @@
+import sys
+import time
+import asyncio
+import threading
+import statistics
+from openai import OpenAI
+from llm_client import LLMClient
+from mock_openai_server import start_mock_server
+
+# Concurrent chat users against a local mock OpenAI-compatible server:
+# the old pattern (a blocking OpenAI client called through asyncio.to_thread)
+# versus the shared LLMClient. Reports wall time, per-request latency,
+# threads and connections used. No network access or API key needed.
+
+MESSAGES = [{'role': 'user', 'content': 'Explain RSI'}]
+
+
+def thread_count():
+    # The mock server runs a thread per connection; leave those out
+    return sum('process_request' not in thread.name for thread in threading.enumerate())
+
+
+async def timed(request):
+    start = time.perf_counter()
+    await request
+    return time.perf_counter() - start
+
+
+async def run_users(make_request, users):
+    peak = [thread_count()]
+
+    async def watch():
+        while True:
+            peak[0] = max(peak[0], thread_count())
+            await asyncio.sleep(0.01)
+
+    watcher = asyncio.create_task(watch())
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(timed(make_request()) for _ in range(users)))
+    wall = time.perf_counter() - start
+    watcher.cancel()
+    return wall, latencies, peak[0]
+
+
+def report(name, server, wall, latencies, peak_threads):
+    stats = server.stats.snapshot()
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{name:<12} wall {wall:6.2f} s  {len(latencies) / wall:6.1f} req/s  "
+          f"p50 {statistics.median(latencies):5.2f} s  p95 {p95:5.2f} s  "
+          f"threads {peak_threads:3d}  connections {stats['connections']:3d}  "
+          f"server in flight {stats['max_in_flight']:3d}  rejected {stats['failed']}")
+
+
+def run(users=200, first_token_latency=0.5, token_delay=0.005, fail_rate=0.0):
+    print(f"users={users} first_token_latency={first_token_latency}s fail_rate={fail_rate}")
+
+    # Old: one sync client, each request holding a default-executor thread
+    server = start_mock_server(first_token_latency=first_token_latency, token_delay=token_delay, fail_rate=fail_rate)
+    client = OpenAI(api_key='bench', base_url=server.base_url)
+    result = asyncio.run(run_users(
+        lambda: asyncio.to_thread(client.chat.completions.create, model='mock', messages=MESSAGES), users))
+    report('to_thread', server, *result)
+    server.shutdown()
+
+    # New: the shared async client
+    server = start_mock_server(first_token_latency=first_token_latency, token_delay=token_delay, fail_rate=fail_rate)
+    llm = LLMClient(api_key='bench', base_url=server.base_url)
+    result = asyncio.run(run_users(lambda: llm.create(MESSAGES, model='mock'), users))
+    report('LLMClient', server, *result)
+    print(f"{'':<12} {llm.stats()}")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200, fail_rate=0.1)
@@ -0,0 +1,151 @@
+import os
+import json
+import hashlib
+import diskcache
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding('cl100k_base')
+except ImportError:  # estimate from the text length instead
+    _encoding = None
+
+# Token budget for the turns sent verbatim. When they outgrow it the window
+# slides: the oldest turns are folded into the summary until the verbatim
+# part is down to SLIDE_TO of the budget, so the (paid) summary is only
+# recomputed every few turns rather than on each one.
+RECENT_TOKENS = int(os.environ.get('CHAT_CONTEXT_TOKENS', 3000))
+SLIDE_TO = 0.5
+
+# Upper bound on the rolling summary of everything before the window
+SUMMARY_TOKENS = 400
+
+# Fixed cost of one message in the chat format (role, separators)
+MESSAGE_OVERHEAD = 4
+
+# Summaries are shared by every worker and background callback process
+SUMMARY_CACHE_DIR = './cache/summaries'
+SUMMARY_CACHE_SIZE = 64 * 1024 * 1024
+SUMMARY_EXPIRE = 7 * 24 * 60 * 60
+
+SYSTEM_PROMPT = "You are a helpful assistant."
+
+SUMMARY_PROMPT = ("Summarize the conversation below for your own future reference. Keep names, numbers, "
+                  "decisions and open questions; drop pleasantries. Reply with the summary only, in at most "
+                  f"{SUMMARY_TOKENS * 3 // 4} words.")
+
+
+def count_tokens(text):
+    """Token count of a text: exact with tiktoken installed, otherwise about 4 UTF-8 bytes per token"""
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(text.encode('utf-8')) // 4 + 1
+
+
+def message_tokens(message):
+    """Token count of a chat message, computed once and cached on the message under 'tokens'"""
+    tokens = message.get('tokens')
+    if tokens is None:
+        tokens = message['tokens'] = count_tokens(message['content']) + MESSAGE_OVERHEAD
+    return tokens
+
+
+def api_role(message):
+    return "assistant" if message['type'] == "bot" else "user"
+
+
+def window_slides(conversation_history, recent_tokens=RECENT_TOKENS, slide_to=SLIDE_TO):
+    """Where the window of verbatim turns started after each slide, oldest first
+
+    Replays the window over the history one message at a time, so the same
+    history always gives the same slides and appending a message can only
+    add one. The window starts at the last slide (or 0), always at a user
+    message; every turn before it is summarized.
+    """
+    slides = []
+    start = 0
+    tail = 0
+    for i, message in enumerate(conversation_history):
+        tail += message_tokens(message)
+        if tail > recent_tokens:
+            while start <= i and (tail > recent_tokens * slide_to or api_role(conversation_history[start]) != "user"):
+                tail -= message_tokens(conversation_history[start])
+                start += 1
+            slides.append(start)
+    return slides
+
+
+def summary_messages(summary, turns):
+    """API message list asking the model to fold turns into the running summary"""
+    text = "\n\n".join(f"{api_role(m)}: {m['content']}" for m in turns)
+    if summary:
+        text = f"Summary so far:\n{summary}\n\nConversation since:\n{text}"
+    return [{"role": "system", "content": SUMMARY_PROMPT},
+            {"role": "user", "content": text}]
+
+
+class ContextWindow:
+    """Builds token-bounded prompts from a conversation
+
+    The system prompt and the turns inside the window go out verbatim;
+    older turns are replaced by a rolling summary. summarize(summary, turns)
+    returns the summary extended with the given turns, or None on failure.
+    Summaries are cached by the turns they cover, so each slide of the
+    window costs one summarize call whichever process serves the turn.
+    """
+
+    def __init__(self, summarize, recent_tokens=RECENT_TOKENS, slide_to=SLIDE_TO,
+                 system_prompt=SYSTEM_PROMPT, cache_dir=SUMMARY_CACHE_DIR):
+        self.summarize = summarize
+        self.recent_tokens = recent_tokens
+        self.slide_to = slide_to
+        self.system_prompt = system_prompt
+        self.cache = diskcache.Cache(cache_dir, size_limit=SUMMARY_CACHE_SIZE)
+        self.summaries_computed = 0
+
+    @staticmethod
+    def _keys(conversation_history, slides):
+        """Cache key for the summary at each slide: a hash chained over the turns it covers"""
+        digest = hashlib.sha256()
+        wanted = set(slides)
+        keys = {}
+        for i, message in enumerate(conversation_history[:slides[-1]]):
+            digest.update(json.dumps([api_role(message), message['content']]).encode('utf-8'))
+            if i + 1 in wanted:
+                keys[i + 1] = f"summary:{i + 1}:{digest.hexdigest()}"
+        return [keys[start] for start in slides]
+
+    def summary(self, conversation_history, slides):
+        """Rolling summary at the last slide, as (summary, number of turns it covers)"""
+        if not slides:
+            return None, 0
+        keys = self._keys(conversation_history, slides)
+
+        # Start from the newest summary on hand; normally that is the last one
+        summary, covered, done = None, 0, 0
+        for k in range(len(slides) - 1, -1, -1):
+            cached = self.cache.get(keys[k])
+            if cached is not None:
+                summary, covered, done = cached, slides[k], k + 1
+                break
+
+        for k in range(done, len(slides)):
+            extended = self.summarize(summary, conversation_history[covered:slides[k]])
+            if extended is None:
+                # The turns not summarized yet go out verbatim; the next turn tries again
+                break
+            self.cache.set(keys[k], extended, expire=SUMMARY_EXPIRE)
+            self.summaries_computed += 1
+            summary, covered = extended, slides[k]
+        return summary, covered
+
+    def build_messages(self, message, conversation_history):
+        """API message list: system prompt, summary of older turns, recent turns, the new message"""
+        slides = window_slides(conversation_history, self.recent_tokens, self.slide_to)
+        summary, covered = self.summary(conversation_history, slides)
+        messages = [{"role": "system", "content": self.system_prompt}]
+        if summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"})
+        for msg in conversation_history[covered:]:
+            messages.append({"role": api_role(msg), "content": msg['content']})
+        messages.append({"role": "user", "content": message})
+        return messages
@@ -0,0 +1,22 @@
+import pytest
+from conversation_store import ConversationStore
+from response_cache import ResponseCache
+
+
+@pytest.fixture(scope='session')
+def chatbot_module(tmp_path_factory):
+    # Imported here, not at collection, so the app's caches go to a temporary
+    # directory instead of the tracked ./cache
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv('CHATBOT_CACHE_DIR', str(tmp_path_factory.mktemp('chatbot-cache')))
+        mp.delenv('CONVERSATION_DIR', raising=False)
+        import deepseek_chatbot
+    return deepseek_chatbot
+
+
+@pytest.fixture
+def chatbot(chatbot_module, tmp_path, monkeypatch):
+    """The chatbot module with an empty response cache and conversation store for this test"""
+    monkeypatch.setattr(chatbot_module, 'response_cache', ResponseCache(str(tmp_path / 'responses')))
+    monkeypatch.setattr(chatbot_module, 'conversation_store', ConversationStore(str(tmp_path / 'conversations')))
+    return chatbot_module
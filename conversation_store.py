@@ -0,0 +1,100 @@
+import os
+import json
+import time
+import uuid
+import threading
+from collections import OrderedDict
+
+# Server-side chat transcripts: one append-only JSON-lines file per
+# conversation, next to the chatbot's diskcache. Every web worker and the
+# background callback processes share them through the filesystem, and a
+# turn only ever writes the new message.
+STORE_DIR = os.environ.get('CONVERSATION_DIR', './cache/conversations')
+
+# Conversations untouched for this long are deleted by prune()
+CONVERSATION_TTL = 7 * 24 * 60 * 60
+
+# Conversations whose parsed messages are kept in memory, per process
+MEMORY_CONVERSATIONS = 256
+
+
+def new_conversation_id():
+    return uuid.uuid4().hex
+
+
+class ConversationStore:
+    """Append-only message log per conversation ID
+
+    Each process keeps the messages it has already parsed together with the
+    file offset they end at, so reading a conversation back only parses the
+    lines appended since the last read, whoever wrote them.
+    """
+
+    def __init__(self, store_dir=STORE_DIR, memory_conversations=MEMORY_CONVERSATIONS):
+        self.store_dir = store_dir
+        self.memory_conversations = memory_conversations
+        self._loaded = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(store_dir, exist_ok=True)
+
+    def _path(self, conversation_id):
+        # IDs come from the browser; only accept what new_conversation_id makes
+        if not isinstance(conversation_id, str) or len(conversation_id) != 32:
+            raise ValueError(f"Invalid conversation ID: {conversation_id!r}")
+        try:
+            int(conversation_id, 16)
+        except ValueError:
+            raise ValueError(f"Invalid conversation ID: {conversation_id!r}") from None
+        return os.path.join(self.store_dir, f"{conversation_id}.jsonl")
+
+    def append(self, conversation_id, message):
+        """Append one message; a single O_APPEND write, so concurrent writers never interleave"""
+        line = (json.dumps(message, ensure_ascii=False) + '\n').encode('utf-8')
+        fd = os.open(self._path(conversation_id), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+    def messages(self, conversation_id):
+        """Return every message of a conversation, oldest first"""
+        path = self._path(conversation_id)
+        with self._lock:
+            offset, messages = self._loaded.pop(conversation_id, (0, []))
+            try:
+                with open(path, 'rb') as f:
+                    f.seek(offset)
+                    data = f.read()
+            except FileNotFoundError:
+                return []
+            # A line still being written by another process is left for the next read
+            complete = data.rfind(b'\n') + 1
+            for line in data[:complete].splitlines():
+                if line.strip():
+                    messages.append(json.loads(line))
+            self._loaded[conversation_id] = (offset + complete, messages)
+            while len(self._loaded) > self.memory_conversations:
+                self._loaded.popitem(last=False)
+            return list(messages)
+
+    def delete(self, conversation_id):
+        path = self._path(conversation_id)
+        with self._lock:
+            self._loaded.pop(conversation_id, None)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def prune(self, ttl=CONVERSATION_TTL):
+        """Delete conversations nobody has written to for ttl seconds; returns how many"""
+        cutoff = time.time() - ttl
+        removed = 0
+        for entry in os.scandir(self.store_dir):
+            if entry.name.endswith('.jsonl') and entry.stat().st_mtime < cutoff:
+                try:
+                    self.delete(entry.name[:-len('.jsonl')])
+                except ValueError:
+                    continue
+                removed += 1
+        return removed
@@ -1,27 +1,51 @@
+import os
 import dash
-from dash import html, dcc, Input, Output, State, callback
+from dash import html, dcc, Input, Output, State, Patch
 from dash.long_callback import DiskcacheLongCallbackManager
 import diskcache
 from dash.exceptions import PreventUpdate
-from openai import OpenAI
-import json
 from datetime import datetime
-import os
+import time
 from dotenv import load_dotenv
 import asyncio
-from dash import callback_context
-from concurrent.futures import ThreadPoolExecutor
+from conversation_store import ConversationStore, new_conversation_id
+from chat_context import ContextWindow, SUMMARY_TOKENS, message_tokens, summary_messages
+from response_cache import ResponseCache
+from llm_client import LLMClient
 
 # Load environment variables
 load_dotenv()
 
-# Initialize OpenAI client
-client = OpenAI(api_key="sk-eedeec16dfd44f2d8f0b3c0007187b04", base_url="https://api.deepseek.com")
+# Shared LLM client: timeouts, retries, and per process a pooled connection
+# set and a cap on requests in flight. Streamed replies run in the processes
+# the background callback manager forks, each with its own pool and cap, so
+# the cap only bounds the synchronous paths (summaries, get_bot_response).
+# The API key comes from DEEPSEEK_API_KEY (.env).
+llm = LLMClient()
+
+# Everything the chatbot keeps on disk lives under CACHE_DIR: background
+# callback results, replies, summaries and (unless CONVERSATION_DIR is
+# set) conversations
+CACHE_DIR = os.environ.get('CHATBOT_CACHE_DIR', './cache')
 
 # Initialize cache and long callback manager
-cache = diskcache.Cache("./cache")
+cache = diskcache.Cache(CACHE_DIR)
 long_callback_manager = DiskcacheLongCallbackManager(cache)
 
+# Conversations live on the server; the browser only holds their ID
+conversation_store = ConversationStore(os.environ.get('CONVERSATION_DIR', os.path.join(CACHE_DIR, 'conversations')))
+
+# Model settings for chat replies
+COMPLETION_PARAMS = dict(model="deepseek-chat", temperature=0.7, max_tokens=1000)
+
+# Replies to prompts seen before are served from disk instead of the API
+response_cache = ResponseCache(os.path.join(CACHE_DIR, 'responses'))
+
+# How often the browser polls a streaming reply (ms), and the least time
+# between two pushes of partial text from the background job (s)
+STREAM_POLL_INTERVAL = 200
+STREAM_PUSH_INTERVAL = 0.05
+
 # Initialize Dash app with async support
 app = dash.Dash(__name__, suppress_callback_exceptions=True, long_callback_manager=long_callback_manager)
 
@@ -89,55 +113,82 @@ BUTTON_STYLE = {
     'cursor': 'pointer',
 }
 
-def get_bot_response(message, conversation_history):
-    """Get response from OpenAI API"""
+def summarize_turns(summary, turns):
+    """Fold turns that left the context window into the running summary"""
     try:
-        # Prepare the messages including conversation history
-        messages = [
-            {"role": "system", "content": "You are a helpful assistant."}
-        ]
+        completion = llm.create_sync(
+            summary_messages(summary, turns),
+            model=COMPLETION_PARAMS["model"],
+            temperature=0.3,
+            max_tokens=SUMMARY_TOKENS
+        )
+        return completion.choices[0].message.content
+    except Exception:
+        return None
+
+# Prompts keep the system prompt and the recent turns verbatim within a
+# token budget; older turns are replaced by a rolling summary
+context_window = ContextWindow(summarize_turns, cache_dir=os.path.join(CACHE_DIR, 'summaries'))
+
+def build_messages(message, conversation_history):
+    """Build the API message list from the conversation history and the new message"""
+    return context_window.build_messages(message, conversation_history)
+
+async def complete(messages):
+    """Reply text for a message list, from the response cache when possible"""
+    reply = response_cache.get(messages, **COMPLETION_PARAMS)
+    if reply is None:
+        completion = await llm.create(messages, **COMPLETION_PARAMS)
+        reply = completion.choices[0].message.content
+        response_cache.set(messages, reply, **COMPLETION_PARAMS)
+    return reply
+
+def stream_bot_response(message, conversation_history):
+    """Stream the response from the OpenAI API, yielding the text received so far"""
+    text = ""
+    try:
+        messages = build_messages(message, conversation_history)
         
-        # Add conversation history
-        for msg in conversation_history:
-            role = "assistant" if msg['type'] == "bot" else "user"
-            content = msg['content']
-            messages.append({"role": role, "content": content})
+        # A cached reply arrives whole
+        cached = response_cache.get(messages, **COMPLETION_PARAMS)
+        if cached is not None:
+            yield cached
+            return
         
-        # Add the current message
-        messages.append({"role": "user", "content": message})
+        for delta in llm.stream_sync(messages, **COMPLETION_PARAMS):
+            text += delta
+            yield text
         
-        # Get completion from OpenAI
-        completion = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=messages,
-            temperature=0.7,
-            max_tokens=1000
-        )
-        
-        return completion.choices[0].message.content
+        # Only complete replies are cached
+        if text:
+            response_cache.set(messages, text, **COMPLETION_PARAMS)
         
     except Exception as e:
-        return f"Error: {str(e)}"
+        yield f"{text}\n\nError: {str(e)}" if text else f"Error: {str(e)}"
+
+def get_bot_response(message, conversation_history):
+    """Get response from OpenAI API"""
+    return llm.run(get_bot_response_async(message, conversation_history))
+
+def create_message_component(message):
+    """Create the component for one message"""
+    message_container = html.Div(style=MESSAGE_CONTAINER_STYLE)
+    
+    if message['type'] == "user":
+        style = USER_MESSAGE_STYLE
+    else:
+        style = BOT_MESSAGE_STYLE
+        
+    # Message content
+    message_container.children = [
+        html.Div(message['content'], style=style),
+        html.Div(message['timestamp'], style=TIMESTAMP_STYLE)
+    ]
+    return message_container
 
 def create_message_components(conversation_history):
     """Create message components from conversation history"""
-    messages = []
-    for message in conversation_history:
-        message_container = html.Div(style=MESSAGE_CONTAINER_STYLE)
-        
-        if message['type'] == "user":
-            style = USER_MESSAGE_STYLE
-        else:
-            style = BOT_MESSAGE_STYLE
-            
-        # Message content
-        message_container.children = [
-            html.Div(message['content'], style=style),
-            html.Div(message['timestamp'], style=TIMESTAMP_STYLE)
-        ]
-        
-        messages.append(message_container)
-    return messages
+    return [create_message_component(message) for message in conversation_history]
 
 # App layout
 app.layout = html.Div([
@@ -146,8 +197,11 @@ app.layout = html.Div([
     
     # Chat container
     html.Div([
-        # Messages area
-        html.Div(id='chat-messages', style={
+        # Messages area: finished messages, then the reply being streamed
+        html.Div([
+            html.Div(id='chat-messages', children=[]),
+            html.Div(id='chat-stream')
+        ], id='chat-box', style={
             'overflowY': 'auto',
             'height': '400px',
             'padding': '10px',
@@ -167,32 +221,38 @@ app.layout = html.Div([
             html.Button('Send', id='send-button', style=BUTTON_STYLE),
         ], style={'display': 'flex', 'alignItems': 'center'}),
         
-        # Store conversation history
-        dcc.Store(id='conversation-history', data=[]),
+        # ID of the conversation in the server-side store
+        dcc.Store(id='conversation-id', data=None),
         
         # Store for triggering bot response
         dcc.Store(id='trigger-bot-response', data=None),
         
-        # Interval component for auto-scrolling
-        dcc.Interval(id='interval-component', interval=500, n_intervals=0)
+        # Output of the clientside auto-scroll; carries no data
+        dcc.Store(id='chat-scroll')
     ], style=CHAT_STYLE)
 ])
 
-# First callback: Handle user input and update immediately
-@callback(
-    [Output('conversation-history', 'data'),
+# First callback: Handle user input and update immediately. Only the
+# conversation ID and the new message cross the wire, in either direction.
+@app.callback(
+    [Output('conversation-id', 'data'),
      Output('user-input', 'value'),
+     Output('chat-messages', 'children'),
      Output('trigger-bot-response', 'data')],
     [Input('send-button', 'n_clicks'),
      Input('user-input', 'n_submit')],
     [State('user-input', 'value'),
-     State('conversation-history', 'data')],
+     State('conversation-id', 'data')],
     prevent_initial_call=True
 )
-def handle_user_input(n_clicks, n_submit, user_input, conversation_history):
+def handle_user_input(n_clicks, n_submit, user_input, conversation_id):
     if not user_input:
         raise PreventUpdate
     
+    if conversation_id is None:
+        conversation_id = new_conversation_id()
+        conversation_store.prune()
+    
     current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
     # Add user message to conversation
@@ -201,131 +261,118 @@ def handle_user_input(n_clicks, n_submit, user_input, conversation_history):
         "content": user_input,
         "timestamp": current_time
     }
-    conversation_history.append(user_message)
+    # Token counts are stored with the message so they are only computed once
+    message_tokens(user_message)
+    conversation_store.append(conversation_id, user_message)
     
-    # Return updated conversation history and trigger bot response
-    return conversation_history, '', user_input
+    # Show the message at once by appending it to what the browser already has
+    messages = Patch()
+    messages.append(create_message_component(user_message))
+    
+    # Trigger the bot response
+    return conversation_id, '', messages, {"conversation_id": conversation_id, "message": user_message}
 
 async def get_bot_response_async(message, conversation_history):
     """Get response from OpenAI API asynchronously"""
     try:
-        # Prepare the messages including conversation history
-        messages = [
-            {"role": "system", "content": "You are a helpful assistant."}
-        ]
-        
-        # Add conversation history
-        for msg in conversation_history:
-            role = "assistant" if msg['type'] == "bot" else "user"
-            content = msg['content']
-            messages.append({"role": role, "content": content})
-        
-        # Add the current message
-        messages.append({"role": "user", "content": message})
+        # Building the prompt may summarize older turns, a blocking call
+        messages = await asyncio.to_thread(build_messages, message, conversation_history)
         
         # Get completion from OpenAI
-        # Use asyncio.to_thread to run the synchronous API call in a separate thread
-        completion = await asyncio.to_thread(
-            client.chat.completions.create,
-            model="deepseek-chat",
-            messages=messages,
-            temperature=0.7,
-            max_tokens=1000
-        )
-        
-        return completion.choices[0].message.content
+        return await complete(messages)
         
     except Exception as e:
         return f"Error: {str(e)}"
 
-def get_bot_response_sync(message, conversation_history):
-    """Get response from OpenAI API synchronously"""
-    try:
-        # Prepare the messages including conversation history
-        messages = [
-            {"role": "system", "content": "You are a helpful assistant."}
-        ]
-        
-        # Add conversation history
-        for msg in conversation_history:
-            role = "assistant" if msg['type'] == "bot" else "user"
-            content = msg['content']
-            messages.append({"role": role, "content": content})
-        
-        # Add the current message
-        messages.append({"role": "user", "content": message})
-        
-        # Get completion from OpenAI
-        completion = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=messages,
-            temperature=0.7,
-            max_tokens=1000
-        )
-        
-        return completion.choices[0].message.content
-        
-    except Exception as e:
-        return f"Error: {str(e)}"
+# Same as get_bot_response, under its older name
+get_bot_response_sync = get_bot_response
 
-@dash.callback(
-    Output('chat-messages', 'children'),
-    [Input('conversation-history', 'data'),
-     Input('trigger-bot-response', 'data')],
+# Stream the bot's reply into an open message: the background job reports
+# the text received so far as progress, which the browser polls every
+# STREAM_POLL_INTERVAL ms while the reply is being generated. Progress only
+# ever carries the open message; the finished reply is appended to the
+# messages already shown and saved to the conversation store.
+@app.callback(
+    [Output('chat-messages', 'children', allow_duplicate=True),
+     Output('chat-stream', 'children')],
+    Input('trigger-bot-response', 'data'),
     prevent_initial_call=True,
+    background=True,
     manager=long_callback_manager,
+    interval=STREAM_POLL_INTERVAL,
+    progress=[Output('chat-stream', 'children')],
     running=[
         (Output('send-button', 'disabled'), True, False),
         (Output('user-input', 'disabled'), True, False),
     ],
 )
-def update_chat_messages(conversation_history, trigger):
-    ctx = callback_context
-    triggered_id = ctx.triggered[0]['prop_id'].split('.')[0]
+def update_chat_messages(set_progress, trigger):
+    if trigger is None:
+        raise PreventUpdate
     
-    if triggered_id == 'trigger-bot-response' and trigger is not None:
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        # Add a "typing" indicator
-        typing_message = {
-            "type": "bot",
-            "content": "Typing...",
-            "timestamp": current_time
-        }
-        conversation_history.append(typing_message)
-        
-        # Create and return temporary message components with typing indicator
-        temp_messages = create_message_components(conversation_history)
-        
-        # Get bot response
-        bot_response = get_bot_response(trigger, conversation_history[:-1])  # Exclude typing message
-        
-        # Remove typing message and add actual response
-        conversation_history.pop()  # Remove typing indicator
-        bot_message = {
-            "type": "bot",
-            "content": bot_response,
-            "timestamp": current_time
-        }
-        conversation_history.append(bot_message)
+    conversation_id = trigger["conversation_id"]
+    # The last stored message is the one being answered; it is sent as the new message
+    conversation_history = conversation_store.messages(conversation_id)[:-1]
     
-    # Create message components
-    return create_message_components(conversation_history)
-
-@callback(
-    Output('chat-messages', 'children', allow_duplicate=True),
-    Input('interval-component', 'n_intervals'),
-    State('chat-messages', 'children'),
-    prevent_initial_call=True
-)
-def scroll_to_bottom(n_intervals, children):
-    if not children:
-        raise PreventUpdate
+    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
-    # Add a dummy div at the bottom to scroll to
-    children.append(html.Div(id='scroll-bottom'))
+    # Add a "typing" indicator until the first tokens arrive
+    bot_message = {
+        "type": "bot",
+        "content": "Typing...",
+        "timestamp": current_time
+    }
+    set_progress([create_message_component(bot_message)])
     
-    return children
+    # Push partial text into the open bot message as tokens arrive,
+    # at most once per STREAM_PUSH_INTERVAL seconds
+    last_push = 0.0
+    for text in stream_bot_response(trigger["message"]["content"], conversation_history):
+        bot_message["content"] = text
+        if time.monotonic() - last_push >= STREAM_PUSH_INTERVAL:
+            set_progress([create_message_component(bot_message)])
+            last_push = time.monotonic()
+    
+    message_tokens(bot_message)
+    conversation_store.append(conversation_id, bot_message)
+    
+    # Move the finished reply out of the open message into the conversation
+    messages = Patch()
+    messages.append(create_message_component(bot_message))
+    return messages, None
+
+# Keep the messages area scrolled to the newest message, in the browser.
+# A MutationObserver catches every change, including streamed partial
+# replies, and does nothing while the user has scrolled up to read.
+app.clientside_callback(
+    """
+    function(children) {
+        var box = document.getElementById('chat-box');
+        if (box && !box._autoScroll) {
+            box._autoScroll = true;
+            box._stick = true;
+            box.addEventListener('scroll', function() {
+                box._stick = box.scrollHeight - box.scrollTop - box.clientHeight < 40;
+            });
+            new MutationObserver(function() {
+                if (box._stick) { box.scrollTop = box.scrollHeight; }
+            }).observe(box, {childList: true, subtree: true, characterData: true});
+        }
+        if (box && box._stick) { box.scrollTop = box.scrollHeight; }
+        return window.dash_clientside.no_update;
+    }
+    """,
+    Output('chat-scroll', 'data'),
+    Input('chat-messages', 'children')
+)
+
+@app.server.route('/cache-stats')
+def cache_stats():
+    return response_cache.stats()
+
+@app.server.route('/llm-stats')
+def llm_stats():
+    return llm.stats()
 
 if __name__ == '__main__':
     app.run(debug=True, port=8050) 
\ No newline at end of file
@@ -0,0 +1,120 @@
+import re
+import math
+import numpy as np
+import pandas as pd
+
+# Budget for a ~1500 px wide chart: at most one line point per pixel, and
+# candles at least three pixels wide so their bodies stay readable. Lines
+# drawn over candles are held to the candle count (see downsample_view).
+MAX_POINTS = 1500
+MAX_CANDLES = 500
+
+# Relayout keys plotly sends for a zoom or pan on any x axis of a subplot figure
+RANGE_KEY = re.compile(r'^xaxis\d*\.range(\[(0|1)\])?$')
+AUTORANGE_KEY = re.compile(r'^xaxis\d*\.autorange$')
+
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets: return indices of the points to keep"""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0] = 0
+    keep[-1] = n - 1
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = 0
+
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Average of the next bucket is the third corner of the triangle
+        next_lo, next_hi = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_lo:max(next_hi, next_lo + 1)].mean()
+        avg_y = y[next_lo:max(next_hi, next_lo + 1)].mean()
+
+        ax, ay = x[selected], y[selected]
+        areas = np.abs((ax - avg_x) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (avg_y - ay))
+        selected = lo + int(np.argmax(areas)) if hi > lo else lo
+        keep[i + 1] = selected
+    return keep
+
+
+def downsample_line(series, max_points=MAX_POINTS):
+    """Downsample a time-indexed series with LTTB, dropping its NaN warm-up"""
+    series = series.dropna()
+    if len(series) <= max_points:
+        return series
+    x = series.index.asi8.astype(np.float64)
+    keep = lttb(x, series.to_numpy(dtype=np.float64), max_points)
+    return series.iloc[keep]
+
+
+def downsample_ohlc(df, max_bars=MAX_CANDLES):
+    """Aggregate consecutive bars into buckets: first open, max high, min low, last close"""
+    n = len(df)
+    if n <= max_bars:
+        return df[['Open', 'High', 'Low', 'Close']]
+    size = math.ceil(n / max_bars)
+    starts = np.arange(0, n, size)
+    ends = np.minimum(starts + size, n) - 1
+    return pd.DataFrame({
+        'Open': df['Open'].to_numpy()[starts],
+        'High': np.maximum.reduceat(df['High'].to_numpy(), starts),
+        'Low': np.minimum.reduceat(df['Low'].to_numpy(), starts),
+        'Close': df['Close'].to_numpy()[ends]
+    }, index=df.index[starts])
+
+
+def visible_range(relayout_data):
+    """Return the (start, end) x range of a zoom or pan event, or None"""
+    if not relayout_data:
+        return None
+    for key, value in relayout_data.items():
+        match = RANGE_KEY.match(key)
+        if not match:
+            continue
+        if match.group(1) is None:
+            return value[0], value[1]
+        axis = key.split('.')[0]
+        start = relayout_data.get(f'{axis}.range[0]')
+        end = relayout_data.get(f'{axis}.range[1]')
+        if start is not None and end is not None:
+            return start, end
+    return None
+
+
+def is_reset(relayout_data):
+    """Check whether a relayout event resets the x axis to its full range"""
+    return bool(relayout_data) and any(AUTORANGE_KEY.match(key) for key in relayout_data)
+
+
+def visible_bars(hist, x_range=None):
+    """Boolean mask of the bars inside a (start, end) x range, or None for all of them"""
+    if x_range is None:
+        return None
+    tz = hist.index.tz
+    start, end = (pd.Timestamp(bound) for bound in x_range)
+    if tz is not None:
+        start, end = start.tz_localize(tz), end.tz_localize(tz)
+    return (hist.index >= start) & (hist.index <= end)
+
+
+def downsample_view(hist, lines, x_range=None, max_candles=MAX_CANDLES, max_points=MAX_POINTS):
+    """Slice OHLC bars and indicator lines to the visible range, then downsample
+
+    Indicators must already be computed on the full history, and lines
+    get no more points than there are candles. Zoomed into a short enough
+    range, the data comes back at full resolution. Returns
+    (candles, {name: series}).
+    """
+    mask = visible_bars(hist, x_range)
+    if mask is not None:
+        hist = hist[mask]
+        lines = {name: series[mask] for name, series in lines.items()}
+
+    candles = downsample_ohlc(hist, max_candles)
+    # The lines are drawn over the candles: once those are bucketed, more
+    # line points than candles add bytes rather than visible detail
+    line_points = min(max_points, max(len(candles), 3))
+    return candles, {name: downsample_line(series, line_points) for name, series in lines.items()}
@@ -0,0 +1,83 @@
+import datetime
+import numpy as np
+import pandas as pd
+
+# Figures are sent as plotly JSON with trace numbers rounded and dates
+# shortened. Base64 typed arrays were tried as well: gzipped, they came out
+# larger than this (f8 or f4 numbers compress far worse than short decimal
+# text) and needed a newer plotly.js than dcc.Graph bundles.
+
+# Trace attributes holding data arrays
+DATA_ATTRIBUTES = ('x', 'y', 'open', 'high', 'low', 'close')
+
+# Significant digits of JSON-encoded trace numbers: far finer than a chart
+# can show, and a third of the 17 digits repr() writes
+JSON_DIGITS = 6
+MAX_JSON_DECIMALS = 10
+
+
+def _is_dates(values):
+    if values.dtype.kind == 'M':
+        return True
+    if values.dtype.kind != 'O':
+        return False
+    first = next((v for v in values if v is not None), None)
+    return isinstance(first, (datetime.date, np.datetime64))
+
+
+def round_significant(values, digits=JSON_DIGITS):
+    """Round an array to the decimals that keep digits significant figures in
+    its smallest nonzero value, so split-adjusted cents keep theirs too"""
+    values = np.asarray(values, dtype=np.float64)
+    finite = np.abs(values[np.isfinite(values) & (values != 0)])
+    if not finite.size:
+        return values
+    decimals = digits - 1 - int(np.floor(np.log10(finite.min())))
+    return np.round(values, min(max(decimals, 0), MAX_JSON_DECIMALS))
+
+
+def date_text(values):
+    """Dates as wall-clock text, without the offset plotly.js ignores and
+    without a time of day when every value is at midnight"""
+    dates = pd.DatetimeIndex(pd.to_datetime(values))
+    if dates.tz is not None:
+        dates = dates.tz_localize(None)
+    valid = dates[~dates.isna()]
+    fmt = '%Y-%m-%d' if (valid == valid.normalize()).all() else '%Y-%m-%d %H:%M:%S'
+    return np.where(dates.isna(), None, dates.strftime(fmt).to_numpy(dtype=object))
+
+
+def compact_array(value):
+    """Shorter JSON for one data attribute: rounded numbers and short dates"""
+    if not isinstance(value, (np.ndarray, pd.Index, pd.Series, list, tuple)):
+        return value
+    values = np.asarray(value)
+    if not len(values):
+        return value
+    if _is_dates(values):
+        return date_text(values)
+    if values.dtype.kind == 'f':
+        return round_significant(values)
+    if values.dtype.kind == 'O':
+        # Gapped numeric arrays (None separators) from the GL segment traces
+        try:
+            rounded = round_significant(np.array([np.nan if v is None else v for v in values], dtype=np.float64))
+        except (TypeError, ValueError):
+            return value
+        return np.where(np.isnan(rounded), None, rounded.astype(object))
+    return value
+
+
+def compact_trace(trace):
+    """A trace dict with its data arrays in compact JSON form"""
+    data = dict(trace if isinstance(trace, dict) else trace.to_plotly_json())
+    for attribute in DATA_ATTRIBUTES:
+        if attribute in data:
+            data[attribute] = compact_array(data[attribute])
+    return data
+
+
+def encode_figure(fig):
+    """Return the figure as a dict with its trace arrays in compact JSON form"""
+    figure = fig.to_plotly_json()
+    return {'data': [compact_trace(trace) for trace in figure['data']], 'layout': figure['layout']}
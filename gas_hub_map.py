@@ -1,8 +1,9 @@
 import dash
 from dash import html, dcc
-from dash.dependencies import Input, Output, State
+from dash.dependencies import Input, Output
 import plotly.express as px
 import pandas as pd
+from map_filters import MAP_FILTER_MODE, row_ids, data_stores, register_map_filter
 
 # Initialize the Dash app
 app = dash.Dash(__name__)
@@ -108,7 +109,35 @@ gas_hubs = {
 }
 
 # Create DataFrame
-df = pd.DataFrame(gas_hubs)
+df = row_ids(pd.DataFrame(gas_hubs))
+
+def build_map(filtered_df):
+    """Build the hub map for a subset of the hubs"""
+    # Add hub name labels to the dataframe for display
+    filtered_df = filtered_df.assign(text=filtered_df['Hub'])
+    # Create the map; customdata[0] is the row, for clientside filtering
+    fig = px.scatter_mapbox(filtered_df,
+                           lat='Latitude',
+                           lon='Longitude',
+                           hover_name='Hub',
+                           hover_data=['Market_Area', 'Description'],
+                           custom_data=['Row'],
+                           zoom=3,
+                           text = 'text',
+                           color = 'Price',
+                           size = 'Volume',
+                           center={'lat': 40, 'lon': -98},  # Center of North America
+                           title='Natural Gas Trading Hubs')
+    
+    # Update map layout
+    fig.update_layout(
+        mapbox_style='carto-positron',  # Light map style
+        margin={'r': 0, 't': 30, 'l': 0, 'b': 0},
+        height=700,
+        title_x=0.5,
+        clickmode='event+select'
+    )
+    return fig
 
 # App layout
 app.layout = html.Div([
@@ -161,43 +190,20 @@ app.layout = html.Div([
     # Bottom Information Panel
     html.Div(id='hub-info',
              style={'margin': '20px', 'padding': '20px', 'backgroundColor': '#f8f9fa',
-                    'borderRadius': '5px', 'boxShadow': '0 2px 4px rgba(0,0,0,0.1)'})
+                    'borderRadius': '5px', 'boxShadow': '0 2px 4px rgba(0,0,0,0.1)'}),
+
+    # Full dataset and figure, shipped once for clientside filtering
+    *(data_stores('gas-hub', df, build_map(df), ['Hub', 'Market_Area'])
+      if MAP_FILTER_MODE == 'clientside' else [])
 ], style={'padding': '20px', 'backgroundColor': 'white'})
 
-@app.callback(
-    [Output('gas-hub-map', 'figure'),
-     Output('hub-info', 'children')],
-    [Input('market-area-dropdown', 'value')]
-)
 def update_map(selected_areas):
     # Filter data based on selected market areas
     if selected_areas:
         filtered_df = df[df['Market_Area'].isin(selected_areas)]
     else:
         filtered_df = df
-    # Add hub name labels to the dataframe for display
-    filtered_df['text'] = filtered_df['Hub']
-    # Create the map
-    fig = px.scatter_mapbox(filtered_df,
-                           lat='Latitude',
-                           lon='Longitude',
-                           hover_name='Hub',
-                           hover_data=['Market_Area', 'Description'],
-                           zoom=3,
-                           text = 'text',
-                           color = 'Price',
-                           size = 'Volume',
-                           center={'lat': 40, 'lon': -98},  # Center of North America
-                           title='Natural Gas Trading Hubs')
-    
-    # Update map layout
-    fig.update_layout(
-        mapbox_style='carto-positron',  # Light map style
-        margin={'r': 0, 't': 30, 'l': 0, 'b': 0},
-        height=700,
-        title_x=0.5,
-        clickmode='event+select'
-    )
+    fig = build_map(filtered_df)
     
     # Create information panel content
     info_content = [
@@ -213,6 +219,19 @@ def update_map(selected_areas):
     
     return fig, info_content
 
+if MAP_FILTER_MODE == 'clientside':
+    # Filtering and the summary panel run in the browser, with no server round trip
+    register_map_filter(app, 'gas-hub', 'gas-hub-map', 'hub-info',
+                        filters=[('market-area-dropdown', 'Market_Area', None)],
+                        name_column='Hub', noun='Hubs',
+                        lists=[('Market Areas Shown:', 'Market_Area')])
+else:
+    app.callback(
+        [Output('gas-hub-map', 'figure'),
+         Output('hub-info', 'children')],
+        [Input('market-area-dropdown', 'value')]
+    )(update_map)
+
 @app.callback(
     Output('selected-hub-details', 'children'),
     [Input('gas-hub-map', 'clickData')]
@@ -0,0 +1,36 @@
+import os
+import multiprocessing
+
+# Production profile for wsgi.py: gunicorn -c gunicorn.conf.py wsgi:application
+
+bind = os.environ.get('BIND', '0.0.0.0:8050')
+
+# Threaded workers: callbacks mostly wait on yfinance, the LLM API or disk,
+# and chart cards and live polls arrive as many small concurrent requests
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY', min(4, multiprocessing.cpu_count())))
+threads = int(os.environ.get('WEB_THREADS', 8))
+
+# Long downloads and LLM completions must not trip the worker timeout
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then to cap memory growth from caches
+max_requests = 2000
+max_requests_jitter = 200
+
+# The shared libraries are imported once in the master and inherited
+# copy-on-write by every worker; the apps themselves still load lazily
+preload_app = True
+
+
+def on_starting(server):
+    import pandas  # noqa: F401
+    import plotly.graph_objects  # noqa: F401
+    import dash  # noqa: F401
+
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('LOG_LEVEL', 'info')
@@ -0,0 +1,189 @@
+import os
+import json
+import math
+import numpy as np
+
+# Stateful versions of calculate_rsi and calculate_moving_averages in
+# stock_visualization.py. Each object consumes one bar (or a batch of new
+# bars) at a time in O(1) per bar and gives the same values as the batch
+# functions would over the full history.
+
+
+class IncrementalRSI:
+    """RSI with EWMA up/down accumulators, matching calculate_rsi"""
+
+    def __init__(self, periods=14):
+        self.periods = periods
+        self.decay = 1.0 - 1.0 / periods
+        self.prev_close = None
+        # Weighted sums and total weight of the adjust=True EWMA
+        self.up_sum = 0.0
+        self.down_sum = 0.0
+        self.weight = 0.0
+        self.observations = 0
+
+    def update(self, close):
+        """Add one close and return the RSI after it (NaN during warm-up)"""
+        close = float(close)
+        if self.prev_close is None or math.isnan(self.prev_close) or math.isnan(close):
+            delta = math.nan
+        else:
+            delta = close - self.prev_close
+        self.prev_close = close
+
+        # Missing values still age earlier observations (pandas ignore_na=False)
+        self.up_sum *= self.decay
+        self.down_sum *= self.decay
+        self.weight *= self.decay
+        if not math.isnan(delta):
+            self.up_sum += max(delta, 0.0)
+            self.down_sum += max(-delta, 0.0)
+            self.weight += 1.0
+            self.observations += 1
+        return self.value()
+
+    def update_many(self, closes):
+        """Add a batch of closes and return the RSI after each one"""
+        return np.array([self.update(close) for close in closes])
+
+    def value(self):
+        if self.observations < self.periods:
+            return math.nan
+        ma_up = self.up_sum / self.weight
+        ma_down = self.down_sum / self.weight
+        if ma_down == 0:
+            return math.nan if ma_up == 0 else 100.0
+        return 100 - (100 / (1 + ma_up / ma_down))
+
+    def snapshot(self):
+        return {
+            'type': 'rsi',
+            'periods': self.periods,
+            'prev_close': self.prev_close,
+            'up_sum': self.up_sum,
+            'down_sum': self.down_sum,
+            'weight': self.weight,
+            'observations': self.observations
+        }
+
+    @classmethod
+    def restore(cls, state):
+        rsi = cls(state['periods'])
+        rsi.prev_close = state['prev_close']
+        rsi.up_sum = state['up_sum']
+        rsi.down_sum = state['down_sum']
+        rsi.weight = state['weight']
+        rsi.observations = state['observations']
+        return rsi
+
+
+class RollingMean:
+    """Rolling mean over a ring buffer, matching Series.rolling(window).mean()"""
+
+    def __init__(self, window):
+        self.window = window
+        self.buffer = [math.nan] * window
+        self.position = 0
+        self.count = 0
+        self.total = 0.0
+        # Missing values in the current window; any gap makes the mean NaN
+        self.missing = 0
+
+    def update(self, value):
+        """Add one value and return the mean of the last `window` values"""
+        value = float(value)
+        if self.count >= self.window:
+            old = self.buffer[self.position]
+            if math.isnan(old):
+                self.missing -= 1
+            else:
+                self.total -= old
+        self.buffer[self.position] = value
+        self.position = (self.position + 1) % self.window
+        self.count += 1
+        if math.isnan(value):
+            self.missing += 1
+        else:
+            self.total += value
+        if self.position == 0:
+            # Resum once per lap so floating-point drift cannot build up
+            self.total = math.fsum(v for v in self.buffer if not math.isnan(v))
+        return self.value()
+
+    def update_many(self, values):
+        return np.array([self.update(value) for value in values])
+
+    def value(self):
+        if self.count < self.window or self.missing:
+            return math.nan
+        return self.total / self.window
+
+    def snapshot(self):
+        return {
+            'type': 'rolling_mean',
+            'window': self.window,
+            'buffer': self.buffer,
+            'position': self.position,
+            'count': self.count,
+            'total': self.total,
+            'missing': self.missing
+        }
+
+    @classmethod
+    def restore(cls, state):
+        mean = cls(state['window'])
+        mean.buffer = list(state['buffer'])
+        mean.position = state['position']
+        mean.count = state['count']
+        mean.total = state['total']
+        mean.missing = state['missing']
+        return mean
+
+
+class IncrementalMovingAverages:
+    """20/60/200 moving averages, matching calculate_moving_averages"""
+
+    def __init__(self, windows=(20, 60, 200)):
+        self.averages = [RollingMean(window) for window in windows]
+
+    def update(self, close):
+        """Add one close and return the tuple of moving averages after it"""
+        return tuple(average.update(close) for average in self.averages)
+
+    def update_many(self, closes):
+        """Add a batch of closes and return one array per moving average"""
+        columns = [[] for _ in self.averages]
+        for close in closes:
+            for column, value in zip(columns, self.update(close)):
+                column.append(value)
+        return tuple(np.array(column) for column in columns)
+
+    def snapshot(self):
+        return {'type': 'moving_averages', 'averages': [average.snapshot() for average in self.averages]}
+
+    @classmethod
+    def restore(cls, state):
+        averages = cls(windows=())
+        averages.averages = [RollingMean.restore(average) for average in state['averages']]
+        return averages
+
+
+INDICATOR_TYPES = {
+    'rsi': IncrementalRSI,
+    'rolling_mean': RollingMean,
+    'moving_averages': IncrementalMovingAverages
+}
+
+
+def save_state(indicators, path):
+    """Write a dict of name -> indicator object to a JSON file"""
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump({name: indicator.snapshot() for name, indicator in indicators.items()}, f)
+    os.replace(f"{path}.tmp", path)
+
+
+def load_state(path):
+    """Read indicators written by save_state"""
+    with open(path, 'r', encoding='utf-8') as f:
+        states = json.load(f)
+    return {name: INDICATOR_TYPES[state['type']].restore(state) for name, state in states.items()}
@@ -0,0 +1,104 @@
+import pickle
+import threading
+from collections import OrderedDict
+import hashlib
+import diskcache
+import pandas as pd
+
+# Shared on-disk tier, next to the chatbot's diskcache in ./cache
+DISK_CACHE_DIR = './cache/indicators'
+DISK_SIZE_LIMIT = 256 * 1024 * 1024
+DISK_EXPIRE = 7 * 24 * 60 * 60
+
+# Memory budget of the in-process LRU tier
+MEMORY_BUDGET = 64 * 1024 * 1024
+
+
+class IndicatorCache:
+    """Two-tier cache for per-ticker results: in-process LRU, then diskcache
+
+    Entries are keyed by (ticker, period, row count, last bar timestamp and
+    values), so a new bar, or a revision of the current one during the
+    session, produces a new key and stale results are never served; old
+    entries age out of the LRU and expire from disk on their own.
+    """
+
+    def __init__(self, memory_budget=MEMORY_BUDGET, disk_dir=DISK_CACHE_DIR,
+                 disk_size_limit=DISK_SIZE_LIMIT, disk_expire=DISK_EXPIRE):
+        self.memory_budget = memory_budget
+        self.disk_expire = disk_expire
+        self.disk = diskcache.Cache(disk_dir, size_limit=disk_size_limit) if disk_dir else None
+        self._entries = OrderedDict()
+        self._memory_used = 0
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(namespace, ticker, period, hist):
+        # yfinance keeps revising the open bar's OHLC under the same timestamp
+        tail = hashlib.sha1(pd.util.hash_pandas_object(hist.tail(1)).to_numpy().tobytes()).hexdigest()[:16]
+        return f"{namespace}:{ticker.upper()}:{period}:{len(hist)}:{hist.index[-1].isoformat()}:{tail}"
+
+    def _remember(self, key, value, size):
+        """Insert into the LRU tier, evicting the oldest entries past the budget"""
+        if size > self.memory_budget:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._memory_used -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._memory_used += size
+            while self._memory_used > self.memory_budget:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._memory_used -= evicted_size
+
+    def get(self, key):
+        """Return a cached value, or None if neither tier has it"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return entry[0]
+
+        if self.disk is not None:
+            payload = self.disk.get(key)
+            if payload is not None:
+                value = pickle.loads(payload)
+                self._remember(key, value, len(payload))
+                with self._lock:
+                    self.disk_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value):
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        self._remember(key, value, len(payload))
+        if self.disk is not None:
+            self.disk.set(key, payload, expire=self.disk_expire)
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for key, computing and storing it on a miss"""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                'memory_entries': len(self._entries),
+                'memory_bytes': self._memory_used,
+                'memory_budget': self.memory_budget
+            }
@@ -0,0 +1,176 @@
+import os
+import time
+import uuid
+import diskcache
+import pandas as pd
+import yfinance as yf
+from price_store import get_history
+from incremental_indicators import IncrementalRSI, IncrementalMovingAverages
+
+# Feed used by live mode: 'replay' plays back stored bars offline,
+# 'yfinance' polls today's one-minute bars
+LIVE_FEED = os.environ.get('LIVE_FEED', 'replay')
+
+# Bars kept on the chart; older bars slide off as new ones arrive
+LIVE_WINDOW = 390
+
+# How often the browser asks for new bars, in milliseconds
+POLL_INTERVAL = 1000
+
+# Replay: how many of the most recent stored bars are held back and played
+# live, and how many of them are released per second
+REPLAY_BARS = 120
+REPLAY_SPEED = float(os.environ.get('LIVE_REPLAY_SPEED', '1.0'))
+
+# Live sessions idle longer than this are dropped
+SESSION_TIMEOUT = 10 * 60
+
+# Sessions are pickled into a disk cache shared by every worker process, so
+# a poll may land on any gunicorn worker; each poll holds the session's lock
+# while it loads, advances and stores it
+SESSION_DIR = './cache/live_sessions'
+SESSION_LOCK_EXPIRE = 30
+
+
+class BarFeed:
+    """Source of OHLCV bars for live mode
+
+    seed() returns the history shown when live mode starts; poll() returns
+    the bars completed since the previous call (possibly none).
+    """
+
+    def seed(self):
+        raise NotImplementedError
+
+    def poll(self):
+        raise NotImplementedError
+
+
+class ReplayFeed(BarFeed):
+    """Plays back bars from the local price store at a configurable speed"""
+
+    def __init__(self, ticker, period='1y', replay_bars=REPLAY_BARS, speed=REPLAY_SPEED, bars=None):
+        bars = get_history(ticker, period=period) if bars is None else bars
+        if len(bars) < 2:
+            raise ValueError(f"Not enough stored bars to replay {ticker}")
+        replay_bars = min(replay_bars, len(bars) - 1)
+        self.history = bars.iloc[:-replay_bars]
+        self.pending = bars.iloc[-replay_bars:]
+        self.speed = speed
+        self.started = None
+        self.released = 0
+
+    def seed(self):
+        # Wall-clock time, since later polls may run in another process
+        self.started = time.time()
+        history, self.history = self.history, None
+        return history
+
+    def poll(self):
+        due = min(len(self.pending), int((time.time() - self.started) * self.speed))
+        new_bars = self.pending.iloc[self.released:due]
+        self.released = max(self.released, due)
+        return new_bars
+
+
+class YFinanceFeed(BarFeed):
+    """Polls yfinance for today's completed one-minute bars"""
+
+    def __init__(self, ticker, period=None, interval='1m'):
+        # The symbol rather than a yf.Ticker, so the feed pickles into the session store
+        self.ticker = ticker
+        self.interval = interval
+        self.last_bar = None
+
+    def _completed_bars(self):
+        bars = yf.Ticker(self.ticker).history(period='1d', interval=self.interval)
+        # The newest bar is still forming; extendData cannot revise it later
+        return bars.iloc[:-1]
+
+    def seed(self):
+        bars = self._completed_bars()
+        self.last_bar = bars.index[-1] if not bars.empty else None
+        return bars
+
+    def poll(self):
+        bars = self._completed_bars()
+        if self.last_bar is not None:
+            bars = bars[bars.index > self.last_bar]
+        if not bars.empty:
+            self.last_bar = bars.index[-1]
+        return bars
+
+
+FEEDS = {
+    'replay': ReplayFeed,
+    'yfinance': YFinanceFeed
+}
+
+
+class LiveSession:
+    """One browser's live stream: a feed plus incrementally updated indicators"""
+
+    def __init__(self, feed):
+        self.feed = feed
+        self.rsi = IncrementalRSI(14)
+        self.moving_averages = IncrementalMovingAverages()
+
+    def _indicators(self, bars):
+        closes = bars['Close'].to_numpy()
+        ma20, ma60, ma200 = self.moving_averages.update_many(closes)
+        rsi = self.rsi.update_many(closes)
+        return {
+            '20 MA': pd.Series(ma20, index=bars.index),
+            '60 MA': pd.Series(ma60, index=bars.index),
+            '200 MA': pd.Series(ma200, index=bars.index),
+            'RSI': pd.Series(rsi, index=bars.index)
+        }
+
+    def start(self):
+        """Warm the indicators on the seed history and return (bars, lines) for the last window"""
+        bars = self.feed.seed()
+        lines = self._indicators(bars)
+        window = bars.iloc[-LIVE_WINDOW:]
+        return window, {name: series.iloc[-LIVE_WINDOW:] for name, series in lines.items()}
+
+    def poll(self):
+        """Return (new bars, their indicator values); both empty when nothing arrived"""
+        bars = self.feed.poll()
+        if bars.empty:
+            return bars, {}
+        return bars, self._indicators(bars)
+
+
+_sessions = diskcache.Cache(SESSION_DIR)
+
+
+def _session_lock(session_id):
+    return diskcache.Lock(_sessions, f'lock:{session_id}', expire=SESSION_LOCK_EXPIRE)
+
+
+def start_session(ticker, period='1y', feed=None):
+    """Create a live session for a ticker and return (session id, seed bars, seed lines)"""
+    feed = feed or FEEDS[LIVE_FEED](ticker, period=period)
+    session = LiveSession(feed)
+    bars, lines = session.start()
+    session_id = uuid.uuid4().hex
+    _sessions.set(session_id, session, expire=SESSION_TIMEOUT)
+    return session_id, bars, lines
+
+
+def poll_session(session_id):
+    """Poll a session in whichever process it was started in; returns
+    (new bars, their indicator values), or None once it is stopped or expired"""
+    with _session_lock(session_id):
+        session = _sessions.get(session_id)
+        if session is None:
+            return None
+        result = session.poll()
+        # Storing it again also restarts the idle timeout
+        _sessions.set(session_id, session, expire=SESSION_TIMEOUT)
+    return result
+
+
+def stop_session(session_id):
+    with _session_lock(session_id):
+        _sessions.delete(session_id)
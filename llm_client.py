@@ -0,0 +1,247 @@
+import os
+import queue
+import random
+import asyncio
+import threading
+from openai import AsyncOpenAI, APIConnectionError, APIStatusError
+
+try:
+    import httpx
+except ImportError:  # newer openai releases are built on httpx2
+    import httpx2 as httpx
+
+# One async client per process for every chat completion: a single event
+# loop thread drives all requests over a shared keep-alive connection pool,
+# so concurrent users cost sockets and coroutines, not blocked threads.
+# Sync callers (Dash callbacks) hand their request to that loop and wait.
+LLM_BASE_URL = os.environ.get('LLM_BASE_URL', 'https://api.deepseek.com')
+LLM_API_KEY_VAR = 'DEEPSEEK_API_KEY'
+
+# Requests in flight at once, per process; the rest queue for a slot. The
+# cap is not shared between processes: every gunicorn worker, and every
+# process the Dash background callback manager forks for a job, has its own
+# loop, pool and count, so the total across them can be higher.
+MAX_IN_FLIGHT = int(os.environ.get('LLM_MAX_IN_FLIGHT', 32))
+
+# Connection pool, sized so every in-flight request has a reusable connection
+MAX_CONNECTIONS = MAX_IN_FLIGHT
+KEEPALIVE_EXPIRY = 30
+
+# Seconds to connect, and between two chunks of a response; each attempt
+# as a whole must finish within REQUEST_TIMEOUT
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 60
+REQUEST_TIMEOUT = 180
+
+# Retries of connection errors, timeouts, 429 and 5xx, with exponential
+# backoff and full jitter (or the server's Retry-After, when it sends one)
+MAX_RETRIES = 3
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 8.0
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+
+def retry_delay(attempt, error=None, base=RETRY_BASE_DELAY, cap=RETRY_MAX_DELAY):
+    """Seconds to wait before retry number attempt (0-based)"""
+    response = getattr(error, 'response', None)
+    if response is not None:
+        try:
+            return min(float(response.headers.get('retry-after')), cap)
+        except (TypeError, ValueError):
+            pass
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def retryable(error):
+    if isinstance(error, (APIConnectionError, asyncio.TimeoutError)):
+        return True
+    return isinstance(error, APIStatusError) and error.status_code in RETRY_STATUSES
+
+
+class LLMClient:
+    """Chat completions through one pooled AsyncOpenAI client per process
+
+    create() and stream() are coroutines usable from any event loop;
+    create_sync() and stream_sync() are their blocking counterparts for
+    threaded code, and run() runs any coroutine that uses them. Within a
+    process all of them share the pool, the retry policy and the
+    MAX_IN_FLIGHT cap.
+    """
+
+    def __init__(self, api_key=None, base_url=LLM_BASE_URL, max_in_flight=MAX_IN_FLIGHT,
+                 max_connections=MAX_CONNECTIONS, request_timeout=REQUEST_TIMEOUT,
+                 max_retries=MAX_RETRIES):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.max_in_flight = max_in_flight
+        self.max_connections = max_connections
+        self.request_timeout = request_timeout
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self._pid = None
+        self._loop = None
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def _start(self):
+        """Start the event loop thread and the client, once per process (forked children start anew)"""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='llm-client', daemon=True).start()
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections,
+                                    keepalive_expiry=KEEPALIVE_EXPIRY),
+                timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT)
+            )
+            self._client = AsyncOpenAI(api_key=self.api_key or os.environ.get(LLM_API_KEY_VAR, ''),
+                                       base_url=self.base_url, http_client=http_client,
+                                       max_retries=0)
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+            self._loop = loop
+            self._pid = os.getpid()
+
+    def _event_loop(self):
+        if self._pid != os.getpid():
+            self._start()
+        return self._loop
+
+    def _on_loop(self):
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    async def _slot(self):
+        await self._semaphore.acquire()
+        self.requests += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def _release(self):
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    async def _backoff(self, attempt, error):
+        if attempt >= self.max_retries or not retryable(error):
+            self.failures += 1
+            raise error
+        self.retries += 1
+        await asyncio.sleep(retry_delay(attempt, error))
+
+    async def _create(self, messages, params):
+        for attempt in range(self.max_retries + 1):
+            # The slot is given back while backing off, so waiting requests can go
+            await self._slot()
+            try:
+                return await asyncio.wait_for(
+                    self._client.chat.completions.create(messages=messages, **params),
+                    self.request_timeout)
+            except Exception as e:
+                error = e
+            finally:
+                self._release()
+            await self._backoff(attempt, error)
+
+    async def _pump(self, messages, params, put):
+        """Stream text deltas into put(kind, value); kinds are 'text', 'done' and 'error'"""
+        try:
+            for attempt in range(self.max_retries + 1):
+                sent = False
+
+                async def consume():
+                    nonlocal sent
+                    stream = await self._client.chat.completions.create(
+                        messages=messages, stream=True, **params)
+                    async for chunk in stream:
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            sent = True
+                            put('text', chunk.choices[0].delta.content)
+
+                await self._slot()
+                try:
+                    # wait_for rather than asyncio.timeout, which needs Python 3.11
+                    await asyncio.wait_for(consume(), self.request_timeout)
+                    put('done', None)
+                    return
+                except Exception as e:
+                    # Text already shown can't be taken back, so only retry before the first token
+                    if sent:
+                        self.failures += 1
+                        raise
+                    error = e
+                finally:
+                    self._release()
+                await self._backoff(attempt, error)
+        except Exception as e:
+            put('error', e)
+
+    async def create(self, messages, **params):
+        """Chat completion (non-streaming), awaitable from any event loop"""
+        loop = self._event_loop()
+        if self._on_loop():
+            return await self._create(messages, params)
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._create(messages, params), loop))
+
+    def run(self, coroutine):
+        """Run a coroutine on the client's loop and wait for its result (from any thread but that loop's)"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._event_loop()).result()
+
+    def create_sync(self, messages, **params):
+        """Chat completion (non-streaming), blocking the calling thread"""
+        return self.run(self._create(messages, params))
+
+    async def stream(self, messages, **params):
+        """Async iterator over the reply's text deltas, usable from any event loop"""
+        loop = self._event_loop()
+        caller = asyncio.get_running_loop()
+        items = asyncio.Queue()
+
+        def put(kind, value):
+            caller.call_soon_threadsafe(items.put_nowait, (kind, value))
+
+        pump = asyncio.run_coroutine_threadsafe(self._pump(messages, params, put), loop)
+        try:
+            while True:
+                kind, value = await items.get()
+                if kind == 'text':
+                    yield value
+                elif kind == 'error':
+                    raise value
+                elif kind == 'done':
+                    return
+        finally:
+            pump.cancel()
+
+    def stream_sync(self, messages, **params):
+        """Iterator over the reply's text deltas, blocking the calling thread between them"""
+        items = queue.SimpleQueue()
+        pump = asyncio.run_coroutine_threadsafe(
+            self._pump(messages, params, lambda kind, value: items.put((kind, value))), self._event_loop())
+        try:
+            while True:
+                kind, value = items.get()
+                if kind == 'text':
+                    yield value
+                elif kind == 'error':
+                    raise value
+                elif kind == 'done':
+                    return
+        finally:
+            # Stops the request if the caller gives up early
+            pump.cancel()
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'retries': self.retries,
+            'failures': self.failures,
+            'in_flight': self.in_flight,
+            'peak_in_flight': self.peak_in_flight,
+            'max_in_flight': self.max_in_flight
+        }
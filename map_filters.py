@@ -0,0 +1,101 @@
+import os
+import json
+from dash import dcc
+from dash.dependencies import Input, Output
+
+# 'clientside' ships the full dataset and figure once and filters in the
+# browser; 'server' rebuilds the figure with a callback on every change
+MAP_FILTER_MODE = os.environ.get('MAP_FILTER_MODE', 'clientside')
+
+# Per-point trace attributes sliced when filtering
+POINT_ATTRIBUTES = ['lat', 'lon', 'text', 'hovertext', 'customdata', 'ids']
+MARKER_ATTRIBUTES = ['color', 'size', 'symbol', 'opacity']
+
+# Filters the full figure by the dropdown selections and builds the summary
+# panel. Every point carries its dataset row in customdata[0], so one mask
+# over the dataset slices every trace px created, whatever it grouped by.
+FILTER_JS = """
+function() {
+    var spec = %(spec)s;
+    var n = arguments.length;
+    var base = arguments[n - 2], data = arguments[n - 1];
+    if (!base || !data) { return [window.dash_clientside.no_update, window.dash_clientside.no_update]; }
+    var selections = Array.prototype.slice.call(arguments, 0, n - 2);
+
+    var rows = data[spec.name_column].length;
+    var keep = new Uint8Array(rows).fill(1);
+    spec.filters.forEach(function(filter, f) {
+        var selected = [].concat(selections[f] || []);
+        if (!selected.length || (filter.all_value && selected.indexOf(filter.all_value) >= 0)) { return; }
+        var wanted = new Set(selected), column = data[filter.column];
+        for (var i = 0; i < rows; i++) { if (!wanted.has(column[i])) { keep[i] = 0; } }
+    });
+
+    function pick(values, index) { return index.map(function(i) { return values[i]; }); }
+    var traces = base.data.map(function(trace) {
+        var index = [];
+        (trace.customdata || []).forEach(function(point, i) { if (keep[point[0]]) { index.push(i); } });
+        var out = Object.assign({}, trace);
+        spec.point_attributes.forEach(function(key) {
+            if (Array.isArray(trace[key])) { out[key] = pick(trace[key], index); }
+        });
+        if (trace.marker) {
+            out.marker = Object.assign({}, trace.marker);
+            spec.marker_attributes.forEach(function(key) {
+                if (Array.isArray(trace.marker[key])) { out.marker[key] = pick(trace.marker[key], index); }
+            });
+        }
+        return out;
+    });
+    var figure = Object.assign({}, base, {data: traces});
+
+    function el(type, children, style) {
+        return {type: type, namespace: 'dash_html_components', props: {children: children, style: style}};
+    }
+    var shown = 0;
+    for (var i = 0; i < rows; i++) { shown += keep[i]; }
+    var summary = [el('P', 'Total ' + spec.noun + ' Shown: ' + shown)];
+    spec.lists.forEach(function(list) {
+        var values = new Set();
+        for (var i = 0; i < rows; i++) { if (keep[i]) { values.add(data[list.column][i]); } }
+        summary.push(el('P', list.label));
+        summary.push(el('Ul', Array.from(values).sort().map(function(v) { return el('Li', v); })));
+    });
+    return [figure, [el('H3', 'Summary Information', {marginBottom: '15px'}), el('Div', summary)]];
+}
+"""
+
+
+def row_ids(df):
+    """The dataset with a Row column, for px custom_data=['Row']"""
+    return df.assign(Row=range(len(df))) if 'Row' not in df else df
+
+
+def data_stores(store_id, df, figure, columns):
+    """The stores the clientside filter reads: the full figure and the filter columns"""
+    return [
+        dcc.Store(id=f'{store_id}-figure', data=figure.to_dict()),
+        dcc.Store(id=f'{store_id}-data', data={column: df[column].tolist() for column in columns})
+    ]
+
+
+def register_map_filter(app, store_id, graph_id, summary_id, filters, name_column, noun, lists):
+    """Filter a map and its summary panel in the browser
+
+    filters is a list of (dropdown id, column, value meaning all or None);
+    lists is a list of (label, column) for the summary panel.
+    """
+    spec = {
+        'filters': [{'column': column, 'all_value': all_value} for _, column, all_value in filters],
+        'name_column': name_column,
+        'noun': noun,
+        'lists': [{'label': label, 'column': column} for label, column in lists],
+        'point_attributes': POINT_ATTRIBUTES,
+        'marker_attributes': MARKER_ATTRIBUTES
+    }
+    app.clientside_callback(
+        FILTER_JS % {'spec': json.dumps(spec)},
+        [Output(graph_id, 'figure'), Output(summary_id, 'children')],
+        [Input(dropdown_id, 'value') for dropdown_id, _, _ in filters]
+        + [Input(f'{store_id}-figure', 'data'), Input(f'{store_id}-data', 'data')]
+    )
@@ -0,0 +1,211 @@
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-in for an OpenAI-compatible chat completions API (DeepSeek's
+# included), for tests and benchmarks that must not call the real service.
+# Replies are canned words streamed with configurable latencies.
+
+DEFAULT_REPLY = ("Sure. Here is a short answer generated by the mock server so that clients "
+                 "can be tested without network access or an API key.")
+
+
+class MockConfig:
+    def __init__(self, first_token_latency=0.2, token_delay=0.02, reply=DEFAULT_REPLY, echo=False,
+                 fail_first=0, fail_rate=0.0, fail_status=429, retry_after=None):
+        # Seconds before the first token, and between later tokens
+        self.first_token_latency = first_token_latency
+        self.token_delay = token_delay
+        self.reply = reply
+        # Reply with the last user message instead of the canned text
+        self.echo = echo
+        # Reject the first fail_first requests, then a fail_rate fraction of
+        # the rest, with fail_status (and a Retry-After header, if given)
+        self.fail_first = fail_first
+        self.fail_rate = fail_rate
+        self.fail_status = fail_status
+        self.retry_after = retry_after
+
+
+class MockStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.connections = 0
+        self.failed = 0
+
+    def enter(self):
+        with self.lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def exit(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def snapshot(self):
+        with self.lock:
+            return {'requests': self.requests, 'in_flight': self.in_flight,
+                    'max_in_flight': self.max_in_flight, 'connections': self.connections,
+                    'failed': self.failed}
+
+
+def count_tokens(text):
+    """Rough token count: one per whitespace-separated word"""
+    return len(text.split())
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so clients can keep connections alive and pool them
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        with self.server.stats.lock:
+            self.server.stats.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=()):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+    def _should_fail(self, config):
+        stats = self.server.stats
+        with stats.lock:
+            fail = stats.requests + stats.failed < config.fail_first or random.random() < config.fail_rate
+            if fail:
+                stats.failed += 1
+        return fail
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/stats':
+            return self._send_json(200, self.server.stats.snapshot())
+        self._send_json(404, {'error': {'message': 'Not found'}})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            return self._send_json(404, {'error': {'message': 'Not found'}})
+
+        config = self.server.config
+        if self._should_fail(config):
+            headers = [('Retry-After', str(config.retry_after))] if config.retry_after is not None else []
+            return self._send_json(config.fail_status, {'error': {'message': 'Mock failure', 'type': 'mock_error'}},
+                                   headers)
+
+        messages = request.get('messages', [])
+        reply = config.reply
+        if config.echo:
+            reply = next((m['content'] for m in reversed(messages) if m.get('role') == 'user'), reply)
+        words = reply.split(' ')
+        max_tokens = request.get('max_tokens')
+        if max_tokens:
+            words = words[:max_tokens]
+        usage = {'prompt_tokens': sum(count_tokens(m.get('content') or '') for m in messages),
+                 'completion_tokens': len(words)}
+        usage['total_tokens'] = usage['prompt_tokens'] + usage['completion_tokens']
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        model = request.get('model', 'mock')
+
+        self.server.stats.enter()
+        try:
+            time.sleep(config.first_token_latency)
+            if not request.get('stream'):
+                time.sleep(config.token_delay * max(len(words) - 1, 0))
+                return self._send_json(200, {
+                    'id': completion_id, 'object': 'chat.completion', 'created': int(time.time()),
+                    'model': model,
+                    'choices': [{'index': 0, 'finish_reason': 'stop',
+                                 'message': {'role': 'assistant', 'content': ' '.join(words)}}],
+                    'usage': usage
+                })
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for i, word in enumerate(words):
+                if i:
+                    time.sleep(config.token_delay)
+                chunk = {'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                         'model': model,
+                         'choices': [{'index': 0, 'finish_reason': None,
+                                      'delta': {'content': word if i == 0 else f" {word}"}}]}
+                self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+            final = {'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                     'model': model, 'choices': [{'index': 0, 'finish_reason': 'stop', 'delta': {}}],
+                     'usage': usage}
+            self._write_chunk(f"data: {json.dumps(final)}\n\n".encode('utf-8'))
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+        finally:
+            self.server.stats.exit()
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, address, config):
+        super().__init__(address, MockHandler)
+        self.config = config
+        self.stats = MockStats()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+
+def start_mock_server(host='127.0.0.1', port=0, **config):
+    """Start a mock server in a background thread; returns the server (see .base_url)"""
+    server = MockServer((host, port), MockConfig(**config))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Mock OpenAI-compatible chat completions server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--first-token-latency', type=float, default=0.2)
+    parser.add_argument('--token-delay', type=float, default=0.02)
+    parser.add_argument('--echo', action='store_true', help='reply with the last user message')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='fraction of requests rejected')
+    parser.add_argument('--fail-status', type=int, default=429)
+    args = parser.parse_args(argv)
+
+    server = MockServer((args.host, args.port), MockConfig(args.first_token_latency, args.token_delay, echo=args.echo,
+                                                           fail_rate=args.fail_rate, fail_status=args.fail_status))
+    print(f"Mock OpenAI server on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,8 +1,9 @@
 import dash
 from dash import html, dcc
-from dash.dependencies import Input, Output, State
+from dash.dependencies import Input, Output
 import plotly.express as px
 import pandas as pd
+from map_filters import MAP_FILTER_MODE, row_ids, data_stores, register_map_filter
 
 # Initialize the Dash app
 app = dash.Dash(__name__)
@@ -110,7 +111,39 @@ oil_markets = {
 }
 
 # Create DataFrame
-df = pd.DataFrame(oil_markets)
+df = row_ids(pd.DataFrame(oil_markets))
+
+def build_map(filtered_df):
+    """Build the market map for a subset of the markets"""
+    # Create the map; customdata[0] is the row, for clientside filtering
+    fig = px.scatter_mapbox(filtered_df,
+                           lat='Latitude',
+                           lon='Longitude',
+                           hover_name='Market',
+                           hover_data=['Type', 'Region'],
+                           custom_data=['Row'],
+                           color='Type',
+                           zoom=1.5,
+                           center={'lat': 30, 'lon': 0},
+                           title='Global Oil Markets')
+    
+    # Update map layout
+    fig.update_layout(
+        mapbox_style='carto-positron',
+        margin={'r': 0, 't': 30, 'l': 0, 'b': 0},
+        height=700,
+        title_x=0.5,
+        clickmode='event+select',
+        showlegend=True,
+        legend=dict(
+            yanchor="top",
+            y=0.99,
+            xanchor="left",
+            x=0.01,
+            bgcolor='rgba(255, 255, 255, 0.8)'
+        )
+    )
+    return fig
 
 # Get unique regions and create options including "All Markets"
 unique_regions = sorted(df['Region'].unique())
@@ -180,15 +213,13 @@ app.layout = html.Div([
     # Bottom Information Panel
     html.Div(id='market-info',
              style={'margin': '20px', 'padding': '20px', 'backgroundColor': '#f8f9fa',
-                    'borderRadius': '5px', 'boxShadow': '0 2px 4px rgba(0,0,0,0.1)'})
+                    'borderRadius': '5px', 'boxShadow': '0 2px 4px rgba(0,0,0,0.1)'}),
+
+    # Full dataset and figure, shipped once for clientside filtering
+    *(data_stores('oil-market', df, build_map(df), ['Market', 'Region', 'Type'])
+      if MAP_FILTER_MODE == 'clientside' else [])
 ], style={'padding': '20px', 'backgroundColor': 'white'})
 
-@app.callback(
-    [Output('oil-market-map', 'figure'),
-     Output('market-info', 'children')],
-    [Input('region-dropdown', 'value'),
-     Input('type-dropdown', 'value')]
-)
 def update_map(selected_regions, selected_types):
     # Filter data based on selections
     filtered_df = df.copy()
@@ -202,33 +233,7 @@ def update_map(selected_regions, selected_types):
     if selected_types:
         filtered_df = filtered_df[filtered_df['Type'].isin(selected_types)]
     
-    # Create the map
-    fig = px.scatter_mapbox(filtered_df,
-                           lat='Latitude',
-                           lon='Longitude',
-                           hover_name='Market',
-                           hover_data=['Type', 'Region'],
-                           color='Type',
-                           zoom=1.5,
-                           center={'lat': 30, 'lon': 0},
-                           title='Global Oil Markets')
-    
-    # Update map layout
-    fig.update_layout(
-        mapbox_style='carto-positron',
-        margin={'r': 0, 't': 30, 'l': 0, 'b': 0},
-        height=700,
-        title_x=0.5,
-        clickmode='event+select',
-        showlegend=True,
-        legend=dict(
-            yanchor="top",
-            y=0.99,
-            xanchor="left",
-            x=0.01,
-            bgcolor='rgba(255, 255, 255, 0.8)'
-        )
-    )
+    fig = build_map(filtered_df)
     
     # Create information panel content
     info_content = [
@@ -250,6 +255,20 @@ def update_map(selected_regions, selected_types):
     
     return fig, info_content
 
+if MAP_FILTER_MODE == 'clientside':
+    # Filtering and the summary panel run in the browser, with no server round trip
+    register_map_filter(app, 'oil-market', 'oil-market-map', 'market-info',
+                        filters=[('region-dropdown', 'Region', 'ALL'), ('type-dropdown', 'Type', None)],
+                        name_column='Market', noun='Markets',
+                        lists=[('Regions Shown:', 'Region'), ('Crude Types Shown:', 'Type')])
+else:
+    app.callback(
+        [Output('oil-market-map', 'figure'),
+         Output('market-info', 'children')],
+        [Input('region-dropdown', 'value'),
+         Input('type-dropdown', 'value')]
+    )(update_map)
+
 @app.callback(
     Output('selected-market-details', 'children'),
     [Input('oil-market-map', 'clickData')]
@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+
+# Indicators computed by compute_indicators unless told otherwise
+RSI_LENGTH = 20
+SMA_WINDOWS = (20, 50, 200)
+EMA_SPANS = (12, 26)
+
+
+def _as_rows(values):
+    """Return a C-contiguous float64 copy so each date row is one contiguous read"""
+    return np.ascontiguousarray(values, dtype=np.float64)
+
+
+def ewm_mean(values, alpha, min_periods=0):
+    """Exponentially weighted mean down each column of a dates x tickers array
+
+    Matches pandas ewm(alpha=alpha, adjust=True, ignore_na=False).mean():
+    missing values contribute no weight but still age the earlier ones, and
+    a column produces output once it has seen min_periods observations.
+    """
+    values = _as_rows(values)
+    out = np.full(values.shape, np.nan)
+    decay = 1.0 - alpha
+    numerator = np.zeros(values.shape[1:])
+    denominator = np.zeros(values.shape[1:])
+    observations = np.zeros(values.shape[1:])
+
+    # Loop over dates only; every ticker is updated in the same vector step
+    for t in range(values.shape[0]):
+        row = values[t]
+        valid = ~np.isnan(row)
+        numerator = numerator * decay + np.where(valid, row, 0.0)
+        denominator = denominator * decay + valid
+        observations += valid
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out[t] = np.where(observations >= max(min_periods, 1), numerator / denominator, np.nan)
+    return out
+
+
+def ema(values, span):
+    """Exponential moving average, as pandas ewm(span=span, min_periods=span).mean()"""
+    return ewm_mean(values, 2.0 / (span + 1.0), min_periods=span)
+
+
+def sma(values, window):
+    """Simple moving average, as pandas rolling(window).mean(): any gap in the window gives NaN"""
+    values = _as_rows(values)
+    valid = ~np.isnan(values)
+    zero_pad = np.zeros((1,) + values.shape[1:])
+    sums = np.concatenate([zero_pad, np.cumsum(np.where(valid, values, 0.0), axis=0)])
+    counts = np.concatenate([zero_pad, np.cumsum(valid, axis=0)])
+
+    out = np.full(values.shape, np.nan)
+    if values.shape[0] < window:
+        return out
+    window_sums = sums[window:] - sums[:-window]
+    window_counts = counts[window:] - counts[:-window]
+    out[window - 1:] = np.where(window_counts == window, window_sums / window, np.nan)
+    return out
+
+
+def rsi(close, length=14):
+    """Wilder RSI for every column, matching pandas_ta.rsi and calculate_rsi"""
+    close = _as_rows(close)
+    delta = np.full(close.shape, np.nan)
+    delta[1:] = close[1:] - close[:-1]
+    up = np.where(np.isnan(delta), np.nan, np.clip(delta, 0, None))
+    down = np.where(np.isnan(delta), np.nan, -np.clip(delta, None, 0))
+
+    ma_up = ewm_mean(up, 1.0 / length, min_periods=length)
+    ma_down = ewm_mean(down, 1.0 / length, min_periods=length)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return 100.0 * ma_up / (ma_up + ma_down)
+
+
+def garman_klass_vol(open_, high, low, close):
+    """Garman-Klass volatility estimate for every bar"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return ((np.log(high) - np.log(low)) ** 2
+                - (2 * np.log(2) - 1) * (np.log(close) - np.log(open_)) ** 2)
+
+
+def compute_indicators(open_, high, low, close, rsi_length=RSI_LENGTH,
+                       sma_windows=SMA_WINDOWS, ema_spans=EMA_SPANS):
+    """Compute the standard indicator set over dates x tickers arrays
+
+    Returns a dict of indicator name -> dates x tickers array.
+    """
+    indicators = {
+        'Garman_Klass_vol': garman_klass_vol(open_, high, low, close),
+        'RSI': rsi(close, rsi_length)
+    }
+    for window in sma_windows:
+        indicators[f'SMA_{window}'] = sma(close, window)
+    for span in ema_spans:
+        indicators[f'EMA_{span}'] = ema(close, span)
+    return indicators
+
+
+def compute_panel_indicators(panel, tickers=None, start=None, end=None, **kwargs):
+    """Compute indicators straight from a panel_store.Panel"""
+    fields = {field: panel.array(field, tickers, start, end) for field in ['open', 'high', 'low', 'close']}
+    return compute_indicators(fields['open'], fields['high'], fields['low'], fields['close'], **kwargs)
+
+
+def to_long(arrays, dates, tickers):
+    """Convert a dict of dates x tickers arrays to the stacked (Date, Ticker) layout"""
+    index = pd.MultiIndex.from_arrays(
+        [np.repeat(dates, len(tickers)), np.tile(tickers, len(dates))],
+        names=['Date', 'Ticker'])
+    return pd.DataFrame({name: np.asarray(values).ravel() for name, values in arrays.items()}, index=index)
@@ -0,0 +1,183 @@
+import os
+import re
+import sys
+import json
+import shutil
+import numpy as np
+import pandas as pd
+
+# Default location of the S&P 500 panel
+PANEL_DIR = os.environ.get('SP500_PANEL_DIR', './data/sp500_panel')
+
+# Fields written when converting a long (date, ticker) frame
+FIELDS = ['open', 'high', 'low', 'close', 'volume']
+
+META_FILE = 'meta.json'
+DATES_FILE = 'dates.npy'
+
+# Matches the stringified "(Timestamp('2020-02-24 00:00:00'), 'AAPL')" keys
+# written by DataFrame.to_json on the stacked frame
+JSON_KEY = re.compile(r"\(Timestamp\('([^']+)'\), '([^']+)'\)")
+
+
+class Panel:
+    """Memory-mapped dates x tickers panel with one float64 array per field
+
+    Arrays are stored in Fortran (column-major) order, so each ticker's
+    history is contiguous on disk and reading a few tickers or a date range
+    only pages in the bytes that are actually sliced.
+    """
+
+    def __init__(self, path=PANEL_DIR):
+        self.path = path
+        with open(os.path.join(path, META_FILE), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.tickers = self.meta['tickers']
+        self.fields = self.meta['fields']
+        self.dates = pd.DatetimeIndex(np.load(os.path.join(path, DATES_FILE)))
+        self._positions = {ticker: i for i, ticker in enumerate(self.tickers)}
+        self._arrays = {}
+
+    def __repr__(self):
+        return f"Panel({len(self.dates)} dates x {len(self.tickers)} tickers, fields={self.fields})"
+
+    def _mmap(self, field):
+        if field not in self._arrays:
+            if field not in self.fields:
+                raise KeyError(f"Field {field} not in panel")
+            self._arrays[field] = np.load(os.path.join(self.path, f"{field}.npy"), mmap_mode='r')
+        return self._arrays[field]
+
+    def _date_slice(self, start=None, end=None):
+        lo = 0 if start is None else self.dates.searchsorted(pd.Timestamp(start), side='left')
+        hi = len(self.dates) if end is None else self.dates.searchsorted(pd.Timestamp(end), side='right')
+        return slice(lo, hi)
+
+    def dates_between(self, start=None, end=None):
+        """Return the panel dates within [start, end]"""
+        return self.dates[self._date_slice(start, end)]
+
+    def _ticker_index(self, tickers=None):
+        if tickers is None:
+            return slice(None)
+        return [self._positions[ticker] for ticker in tickers]
+
+    def array(self, field, tickers=None, start=None, end=None):
+        """Return the field as a dates x tickers array, a zero-copy view when no tickers are picked"""
+        rows = self._date_slice(start, end)
+        cols = self._ticker_index(tickers)
+        return self._mmap(field)[rows, cols]
+
+    def frame(self, field, tickers=None, start=None, end=None):
+        """Return the field as a wide dates x tickers DataFrame"""
+        return pd.DataFrame(self.array(field, tickers, start, end),
+                            index=self.dates_between(start, end),
+                            columns=self.tickers if tickers is None else list(tickers))
+
+    def to_long(self, fields=None, tickers=None, start=None, end=None):
+        """Return the panel in the stacked (Date, Ticker) layout of the old pickle"""
+        fields = fields or self.fields
+        dates = self.dates_between(start, end)
+        names = self.tickers if tickers is None else list(tickers)
+        index = pd.MultiIndex.from_arrays(
+            [np.repeat(dates, len(names)), np.tile(names, len(dates))],
+            names=['Date', 'Ticker'])
+        # Row-major ravel of a dates x tickers block matches the (Date, Ticker) order
+        data = {field: np.asarray(self.array(field, tickers, start, end)).ravel() for field in fields}
+        df = pd.DataFrame(data, index=index)
+        # Stacking drops tickers that had no bar on a date; do the same here
+        return df.dropna(how='all')
+
+
+def open_panel(path=PANEL_DIR):
+    """Open a panel written by write_panel"""
+    return Panel(path)
+
+
+def panel_exists(path=PANEL_DIR):
+    return os.path.exists(os.path.join(path, META_FILE))
+
+
+def write_panel(df, path=PANEL_DIR, fields=None):
+    """Write a long (Date, Ticker) frame as a memory-mappable panel directory"""
+    fields = fields or [field for field in df.columns if field in FIELDS] or list(df.columns)
+    df = df[fields]
+    dates = pd.DatetimeIndex(df.index.get_level_values(0).unique()).sort_values()
+    tickers = sorted(df.index.get_level_values(1).unique())
+
+    # Write into a temp directory and swap it in, so readers never see a partial panel
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    for field in fields:
+        wide = df[field].unstack(level=1).reindex(index=dates, columns=tickers)
+        values = np.asfortranarray(wide.to_numpy(dtype=np.float64))
+        np.save(os.path.join(tmp_path, f"{field}.npy"), values)
+
+    np.save(os.path.join(tmp_path, DATES_FILE), dates.tz_localize(None).values.astype('datetime64[ns]'))
+    with open(os.path.join(tmp_path, META_FILE), 'w', encoding='utf-8') as f:
+        json.dump({
+            'tickers': tickers,
+            'fields': fields,
+            'shape': [len(dates), len(tickers)],
+            'start': str(dates[0].date()) if len(dates) else None,
+            'end': str(dates[-1].date()) if len(dates) else None
+        }, f)
+
+    old_path = f"{path}.old"
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+def convert_pickle(pickle_path='sp500_data.pkl', path=PANEL_DIR):
+    """Convert the stacked sp500_data.pkl frame into a panel"""
+    df = pd.read_pickle(pickle_path)
+    df.columns = df.columns.str.lower()
+    write_panel(df, path)
+
+
+def convert_json(json_path='sp500_json.json', path=PANEL_DIR):
+    """Convert sp500_json.json, whose keys are stringified (Timestamp, ticker) tuples, into a panel"""
+    with open(json_path, 'r', encoding='utf-8') as f:
+        raw = json.load(f)
+    columns = {}
+    for field, cells in raw.items():
+        keys = [JSON_KEY.match(key).groups() for key in cells]
+        index = pd.MultiIndex.from_arrays(
+            [pd.to_datetime([date for date, _ in keys]), [ticker for _, ticker in keys]],
+            names=['Date', 'Ticker'])
+        columns[field.lower()] = pd.Series(list(cells.values()), index=index, dtype=np.float64)
+    write_panel(pd.DataFrame(columns), path)
+
+
+def build_from_partitions(symbols, data_dir, path=PANEL_DIR):
+    """Build a panel from the per-ticker partitions written by sp500_stocks.loadData
+
+    Returns False, leaving any existing panel alone, when no partition has been written yet
+    """
+    from price_store import read_partition
+    frames = {symbol: read_partition(symbol, data_dir) for symbol in sorted(symbols)}
+    frames = {symbol: df for symbol, df in frames.items() if df is not None}
+    if not frames:
+        return False
+    df = pd.concat(frames, names=['Ticker', 'Date']).swaplevel().sort_index()
+    write_panel(df, path)
+    return True
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python panel_store.py <sp500_data.pkl|sp500_json.json> [panel_dir]")
+        sys.exit(1)
+
+    source = sys.argv[1]
+    output = sys.argv[2] if len(sys.argv) > 2 else PANEL_DIR
+    if source.endswith('.json'):
+        convert_json(source, output)
+    else:
+        convert_pickle(source, output)
+    print(open_panel(output))
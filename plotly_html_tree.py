@@ -187,8 +187,13 @@ class HTMLTreeVisualizer:
         
         return fig
 
-def visualize_html(url_or_file, output_file=None):
-    """Main function to visualize HTML structure"""
+def visualize_html(url_or_file, output_file=None, include_plotlyjs=True):
+    """Main function to visualize HTML structure
+
+    include_plotlyjs is passed to write_html: 'cdn', or a path such as
+    'plotly.min.js' to share one bundle between pages, keeps the output
+    file small instead of inlining all of plotly.js.
+    """
     visualizer = HTMLTreeVisualizer()
     
     # Get HTML content
@@ -202,7 +207,7 @@ def visualize_html(url_or_file, output_file=None):
     
     # Save or show plot
     if output_file:
-        fig.write_html(output_file)
+        fig.write_html(output_file, include_plotlyjs=include_plotlyjs)
         print(f"Plot saved to {output_file}")
     else:
         fig.show()
@@ -0,0 +1,393 @@
+import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import pandas as pd
+import yfinance as yf
+from single_flight import SingleFlight
+
+# Local OHLCV store: one parquet file per ticker plus a small JSON sidecar
+# recording how far back the file is complete and when it was last synced.
+STORE_DIR = os.environ.get('PRICE_STORE_DIR', './data/ohlcv')
+
+# Seconds before a stored ticker is checked again for new bars
+REFRESH_INTERVAL = 15 * 60
+
+# Upper bound on per-symbol fallback downloads running at once
+MAX_FETCH_WORKERS = 8
+
+# Map yfinance period strings to the offset they cover
+PERIOD_OFFSETS = {
+    '1d': pd.DateOffset(days=1),
+    '5d': pd.DateOffset(days=5),
+    '1mo': pd.DateOffset(months=1),
+    '3mo': pd.DateOffset(months=3),
+    '6mo': pd.DateOffset(months=6),
+    '1y': pd.DateOffset(years=1),
+    '2y': pd.DateOffset(years=2),
+    '5y': pd.DateOffset(years=5),
+    '10y': pd.DateOffset(years=10),
+    'max': None
+}
+
+# Fetch this much history on a ticker's first request and serve every
+# shorter period by slicing it locally. Set to None to fetch only the
+# requested period.
+PREFETCH_PERIOD = os.environ.get('PRICE_STORE_PREFETCH', '5y') or None
+
+# Keep yf.download output in the same shape as Ticker.history: adjusted
+# prices, dividend/split columns and an exchange-local tz-aware index
+HISTORY_KWARGS = dict(auto_adjust=True, actions=True, ignore_tz=False)
+
+# A split or dividend re-adjusts every earlier price, so bars stored before
+# one no longer line up with bars downloaded after it
+ACTION_COLUMNS = ('Dividends', 'Stock Splits')
+
+# A symbol being downloaded is marked with a .pending file next to its
+# partition; other requests for it wait (polling every PENDING_POLL_INTERVAL
+# seconds) for the data instead of downloading it too. A marker older than
+# PENDING_TIMEOUT seconds is treated as abandoned.
+PENDING_TIMEOUT = 60
+PENDING_POLL_INTERVAL = 0.1
+
+# Coalesces identical history requests across threads and worker processes
+history_flight = SingleFlight('history')
+
+# Slack allowed between the requested start and the first stored bar
+# (weekends and holidays mean the first bar rarely lands on the exact date)
+COVERAGE_TOLERANCE = pd.Timedelta(days=7)
+
+
+def _data_path(ticker, store_dir=None):
+    return os.path.join(store_dir or STORE_DIR, f"{ticker.upper()}.parquet")
+
+
+def _meta_path(ticker, store_dir=None):
+    return os.path.join(store_dir or STORE_DIR, f"{ticker.upper()}.json")
+
+
+def read_meta(ticker, store_dir=None):
+    """Read the sidecar metadata for a stored ticker"""
+    try:
+        with open(_meta_path(ticker, store_dir), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def read_partition(ticker, store_dir=None, columns=None):
+    """Read the stored history for a ticker, or None if nothing is stored"""
+    path = _data_path(ticker, store_dir)
+    if not os.path.exists(path):
+        return None
+    return pd.read_parquet(path, columns=columns)
+
+
+def write_partition(ticker, df, store_dir=None, **meta):
+    """Atomically write a ticker's history and merge extra keys into its metadata"""
+    store_dir = store_dir or STORE_DIR
+    os.makedirs(store_dir, exist_ok=True)
+
+    # Write to a temp file first so readers never see a half-written partition
+    path = _data_path(ticker, store_dir)
+    tmp_path = f"{path}.tmp"
+    df.to_parquet(tmp_path)
+    os.replace(tmp_path, path)
+
+    if meta:
+        _write_meta(ticker, store_dir, **meta)
+
+
+def _write_meta(ticker, store_dir=None, **meta):
+    """Merge keys into a ticker's metadata without rewriting the partition"""
+    merged = {**read_meta(ticker, store_dir), **meta}
+    meta_path = _meta_path(ticker, store_dir)
+    with open(f"{meta_path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(merged, f)
+    os.replace(f"{meta_path}.tmp", meta_path)
+
+
+def _pending_path(ticker, store_dir=None):
+    return os.path.join(store_dir or STORE_DIR, f"{ticker.upper()}.pending")
+
+
+def _claim(ticker, store_dir=None):
+    """Mark a ticker as being downloaded; False if another request already is
+
+    The marker is a file, so requests in other worker processes see it too.
+    """
+    path = _pending_path(ticker, store_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        return True
+    except FileExistsError:
+        pass
+    try:
+        if time.time() - os.path.getmtime(path) < PENDING_TIMEOUT:
+            return False
+        # Left behind by a worker that died mid-download
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    return _claim(ticker, store_dir)
+
+
+def _release(ticker, store_dir=None):
+    try:
+        os.remove(_pending_path(ticker, store_dir))
+    except FileNotFoundError:
+        pass
+
+
+def _wait_for_release(tickers, store_dir=None):
+    """Wait until no other request is downloading any of the tickers"""
+    deadline = time.time() + PENDING_TIMEOUT
+    pending = list(tickers)
+    while pending and time.time() < deadline:
+        time.sleep(PENDING_POLL_INTERVAL)
+        pending = [ticker for ticker in pending if os.path.exists(_pending_path(ticker, store_dir))]
+
+
+def merge_bars(stored, new_bars):
+    """Append new bars to stored history, letting newer rows replace overlapping ones"""
+    if stored is None or stored.empty:
+        return new_bars.sort_index()
+    if new_bars is None or new_bars.empty:
+        return stored
+    merged = pd.concat([stored, new_bars])
+    merged = merged[~merged.index.duplicated(keep='last')]
+    return merged.sort_index()
+
+
+def has_corporate_action(bars):
+    """Check whether any bar carries a split or dividend"""
+    columns = [column for column in ACTION_COLUMNS if column in bars.columns]
+    return bool(columns) and bool((bars[columns].fillna(0) != 0).to_numpy().any())
+
+
+def period_start(period, now):
+    """Return the first timestamp covered by a yfinance period string, or None for 'max'"""
+    if period not in PERIOD_OFFSETS:
+        raise ValueError(f"Unsupported period: {period}")
+    offset = PERIOD_OFFSETS[period]
+    return None if offset is None else now - offset
+
+
+def fetch_period(period):
+    """Return the period to download for a request: the prefetch window if it contains the period"""
+    if PREFETCH_PERIOD is None or period == 'max':
+        return period
+    now = pd.Timestamp.now().normalize()
+    if PREFETCH_PERIOD == 'max' or period_start(PREFETCH_PERIOD, now) <= period_start(period, now):
+        return PREFETCH_PERIOD
+    return period
+
+
+def slice_period(df, period):
+    """Slice a stored history down to the requested period
+
+    The window is anchored on the last stored trading session rather than
+    the wall clock, and starts at the first session on or after the cutoff,
+    so weekends and holidays never shorten a period. Intraday bars are
+    compared by session date so the first session is kept whole.
+    """
+    if df.empty:
+        return df
+    sessions = df.index.normalize()
+    start = period_start(period, sessions[-1])
+    if start is None:
+        return df
+    return df.iloc[sessions.searchsorted(start, side='left'):]
+
+
+def _covers(meta, period, now):
+    """Check whether the stored history reaches back far enough for a period"""
+    covered_from = meta.get('covered_from')
+    if covered_from is None:
+        return False
+    if covered_from == 'max':
+        return True
+    start = period_start(period, now)
+    if start is None:
+        return False
+    return pd.Timestamp(covered_from) <= start + COVERAGE_TOLERANCE
+
+
+def get_history(ticker, period='1y', store_dir=None):
+    """Return OHLCV history for a ticker, downloading only bars missing from the local store"""
+    return get_many_histories([ticker], period, store_dir)[ticker.strip().upper()]
+
+
+def get_many_histories(symbols, period='1y', store_dir=None):
+    """Return {symbol: history} for several symbols from the local store
+
+    Symbols with no (or too short) stored history are downloaded in one
+    batch covering the prefetch window; stored symbols that are due for a
+    refresh are topped up in a second batch with only the bars after their
+    last stored session, unless those bars hold a split or dividend: then
+    the whole stored window is downloaded again, since the earlier prices
+    change with it. Fresh symbols make no network calls at all.
+    Concurrent identical requests share one execution, and a symbol that
+    another request is already downloading is read once that download
+    has stored it.
+    """
+    symbols = list(dict.fromkeys(symbol.strip().upper() for symbol in symbols if symbol.strip()))
+    key = f"{store_dir or STORE_DIR}:{period}:{','.join(symbols)}"
+    return history_flight.do(key, lambda: _get_many_histories(symbols, period, store_dir))
+
+
+def _get_many_histories(symbols, period, store_dir):
+    now = pd.Timestamp.now(tz='UTC')
+    stored, results, cold, stale, busy = {}, {}, [], [], []
+
+    for symbol in symbols:
+        df = read_partition(symbol, store_dir)
+        meta = read_meta(symbol, store_dir)
+        if df is None or df.empty or not _covers(meta, period, now):
+            due = cold
+        elif time.time() - meta.get('synced_at', 0) > REFRESH_INTERVAL:
+            due = stale
+        else:
+            results[symbol] = slice_period(df, period)
+            continue
+        # Leave symbols another request is already downloading to that request
+        if not _claim(symbol, store_dir):
+            busy.append(symbol)
+            continue
+        if df is not None and not df.empty:
+            stored[symbol] = df
+        due.append(symbol)
+
+    try:
+        if cold:
+            # Cold (or too short) history: download the whole fetch window once
+            window = fetch_period(period)
+            start = period_start(window, pd.Timestamp.now(tz='UTC').normalize())
+            covered_from = 'max' if start is None else start.isoformat()
+
+            def store_cold(symbol, fresh):
+                if fresh.empty:
+                    results[symbol] = slice_period(stored[symbol], period) if symbol in stored else fresh
+                else:
+                    merged = merge_bars(read_partition(symbol, store_dir), fresh)
+                    write_partition(symbol, merged, store_dir, synced_at=time.time(), covered_from=covered_from)
+                    results[symbol] = slice_period(merged, period)
+                _release(symbol, store_dir)
+
+            download_many(cold, start=None if start is None else start.strftime('%Y-%m-%d'),
+                          end=None, on_frame=store_cold, **HISTORY_KWARGS)
+
+        if stale:
+            # Warm history: fetch from the earliest last stored session onwards.
+            # The last bar is requested again because it may have been a partial,
+            # in-session bar.
+            last_day = min(stored[symbol].index[-1] for symbol in stale).strftime('%Y-%m-%d')
+            readjust = []
+
+            def store_stale(symbol, new_bars):
+                if not new_bars.empty and has_corporate_action(new_bars[new_bars.index > stored[symbol].index[-1]]):
+                    # Appending would leave a false jump at the split or dividend
+                    readjust.append(symbol)
+                    return
+                if new_bars.empty:
+                    _write_meta(symbol, store_dir, synced_at=time.time())
+                else:
+                    stored[symbol] = merge_bars(stored[symbol], new_bars)
+                    write_partition(symbol, stored[symbol], store_dir, synced_at=time.time())
+                results[symbol] = slice_period(stored[symbol], period)
+                _release(symbol, store_dir)
+
+            download_many(stale, start=last_day, end=None, on_frame=store_stale, **HISTORY_KWARGS)
+
+            if readjust:
+                # Download the whole window these symbols cover again, adjusted as of today
+                covered = [read_meta(symbol, store_dir).get('covered_from') for symbol in readjust]
+                start = None if 'max' in covered else min(pd.Timestamp(c) for c in covered)
+
+                def store_readjusted(symbol, fresh):
+                    if not fresh.empty:
+                        # Replaces the stored bars rather than merging into them
+                        stored[symbol] = fresh.sort_index()
+                        write_partition(symbol, stored[symbol], store_dir, synced_at=time.time(),
+                                        covered_from='max' if start is None else start.isoformat())
+                    # On failure the old bars are served and the next refresh tries again
+                    results[symbol] = slice_period(stored[symbol], period)
+                    _release(symbol, store_dir)
+
+                download_many(readjust, start=None if start is None else start.strftime('%Y-%m-%d'),
+                              end=None, on_frame=store_readjusted, **HISTORY_KWARGS)
+    finally:
+        for symbol in cold + stale:
+            _release(symbol, store_dir)
+
+    if busy:
+        # Read these once the other download is done; a symbol it failed on
+        # is claimed and downloaded here
+        _wait_for_release(busy, store_dir)
+        results.update(_get_many_histories(busy, period, store_dir))
+
+    return {symbol: results[symbol] for symbol in symbols}
+
+
+def split_batch(df, symbols):
+    """Split a batched yf.download frame into one frame per symbol"""
+    frames = {}
+    if not isinstance(df.columns, pd.MultiIndex):
+        # yfinance returns flat columns when only one symbol was requested
+        frames[symbols[0]] = df.dropna(how='all')
+        return frames
+    available = set(df.columns.get_level_values(0))
+    for symbol in symbols:
+        if symbol in available:
+            frames[symbol] = df[symbol].dropna(how='all')
+        else:
+            frames[symbol] = pd.DataFrame()
+    return frames
+
+
+def _download_one(symbol, start, end, **kwargs):
+    try:
+        return yf.download(symbol, start=start, end=end, progress=False, **kwargs)
+    except Exception:
+        return pd.DataFrame()
+
+
+def download_many(symbols, start, end, max_workers=MAX_FETCH_WORKERS, on_frame=None, **kwargs):
+    """Download several symbols in one batched request
+
+    Symbols that come back empty from the batch are retried individually
+    on a bounded thread pool. Returns a dict of symbol -> DataFrame, with an
+    empty frame for symbols that still have no data. If given, on_frame is
+    called with each symbol and its final frame as soon as that frame is in,
+    so batch results are not held back by the retries. Extra keyword
+    arguments are passed on to yf.download.
+    """
+    symbols = list(dict.fromkeys(s for s in symbols if s))
+    if not symbols:
+        return {}
+
+    try:
+        batch = yf.download(symbols, start=start, end=end, group_by='ticker',
+                            threads=True, progress=False, **kwargs)
+        frames = split_batch(batch, symbols)
+    except Exception:
+        frames = {symbol: pd.DataFrame() for symbol in symbols}
+
+    failed = [symbol for symbol, df in frames.items() if df.empty]
+    if on_frame is not None:
+        for symbol, df in frames.items():
+            if not df.empty:
+                on_frame(symbol, df)
+
+    # Retry the symbols the batch failed on, a few at a time
+    if failed:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(failed))) as pool:
+            futures = {pool.submit(_download_one, symbol, start, end, **kwargs): symbol for symbol in failed}
+            for future in as_completed(futures):
+                symbol = futures[future]
+                frames[symbol] = future.result()
+                if on_frame is not None:
+                    on_frame(symbol, frames[symbol])
+
+    return frames
@@ -0,0 +1,184 @@
+import os
+import statistics
+from collections import deque
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from flask import request, jsonify
+from dash import dcc
+from dash.dependencies import Input, Output, State
+
+# 'auto' switches to WebGL above GL_POINT_THRESHOLD points; 'svg' and
+# 'webgl' force one renderer for every trace. The count is that of the
+# series in view before downsampling: downsampled traces are capped at
+# MAX_POINTS / MAX_CANDLES, below the threshold, so counting what is
+# drawn would never pick WebGL.
+RENDER_MODE = os.environ.get('RENDER_MODE', 'auto')
+GL_POINT_THRESHOLD = 2000
+
+# Client render timings reported by the browser, newest last
+RENDER_TIMINGS_SIZE = 1000
+RENDER_TIMINGS = deque(maxlen=RENDER_TIMINGS_SIZE)
+RENDER_MODES = ('svg', 'webgl')
+
+
+def use_webgl(n_points, mode=None):
+    """Decide whether a series of n_points (before downsampling) should be drawn with WebGL"""
+    mode = mode or RENDER_MODE
+    if mode == 'webgl':
+        return True
+    if mode == 'svg':
+        return False
+    return n_points > GL_POINT_THRESHOLD
+
+
+def line_trace(x, y, mode=None, n_points=None, **kwargs):
+    """Return a Scatter line, or Scattergl when the series is large
+
+    n_points is the length of the series x and y were downsampled from,
+    when they were.
+    """
+    trace_type = go.Scattergl if use_webgl(n_points or len(x), mode) else go.Scatter
+    return trace_type(x=x, y=y, **kwargs)
+
+
+def _ohlc_segments(x, open_, high, low, close, tick_width):
+    """Vertices for OHLC bars drawn as line segments: a high-low wick, an
+    open tick to the left and a close tick to the right, split by gaps"""
+    xs = np.full((len(x), 9), None, dtype=object)
+    ys = np.full((len(x), 9), None, dtype=object)
+    centre = x.to_pydatetime()
+    xs[:, [0, 1, 4, 6]] = centre[:, None]
+    xs[:, 3] = (x - tick_width).to_pydatetime()
+    xs[:, 7] = (x + tick_width).to_pydatetime()
+    ys[:, 0], ys[:, 1] = low, high
+    ys[:, 3], ys[:, 4] = open_, open_
+    ys[:, 6], ys[:, 7] = close, close
+    return xs.ravel(), ys.ravel()
+
+
+def price_traces(x, open_, high, low, close, name='Price', mode=None, n_points=None,
+                 increasing_color='#26a69a', decreasing_color='#ef5350'):
+    """Return the traces for a price series
+
+    Small series get a normal Candlestick. Large ones are drawn as OHLC
+    bars made of Scattergl line segments, one trace for up bars and one
+    for down bars, which WebGL renders far faster than SVG candles.
+    n_points is the number of bars the series was downsampled from, if any.
+    """
+    if not use_webgl(n_points or len(x), mode):
+        return [go.Candlestick(x=x, open=open_, high=high, low=low, close=close, name=name,
+                               increasing_line_color=increasing_color,
+                               decreasing_line_color=decreasing_color)]
+
+    x = pd.DatetimeIndex(x)
+    open_, high, low, close = (np.asarray(v, dtype=np.float64) for v in (open_, high, low, close))
+    spacing = pd.Timedelta(np.median(np.diff(x.asi8))) if len(x) > 1 else pd.Timedelta(days=1)
+    tick_width = spacing * 0.3
+    rising = close >= open_
+
+    traces = []
+    for mask, color, label in [(rising, increasing_color, 'up'), (~rising, decreasing_color, 'down')]:
+        xs, ys = _ohlc_segments(x[mask], open_[mask], high[mask], low[mask], close[mask], tick_width)
+        traces.append(go.Scattergl(x=xs, y=ys, mode='lines', name=name,
+                                   legendgroup=name, showlegend=label == 'up',
+                                   line=dict(color=color, width=1),
+                                   hoverinfo='x+y', connectgaps=False))
+    return traces
+
+
+def figure_render_mode(fig):
+    """Tag a figure with the renderer its traces use, for the timing hook"""
+    gl = any(trace.type == 'scattergl' for trace in fig.data)
+    fig.update_layout(meta={'render_mode': 'webgl' if gl else 'svg'})
+    return fig
+
+
+# Runs when a graph's figure changes: waits for plotly_afterplot and reports
+# how long the browser took to draw the new figure
+RENDER_TIMING_JS = """
+function(figure, id) {
+    if (!figure) { return window.dash_clientside.no_update; }
+    var start = performance.now();
+    var domId = typeof id === 'object'
+        ? JSON.stringify(Object.keys(id).sort().reduce(function(o, k) { o[k] = id[k]; return o; }, {}))
+        : id;
+    var meta = (figure.layout && figure.layout.meta) || {};
+    var points = (figure.data || []).reduce(function(n, t) { return n + ((t.x && t.x.length) || 0); }, 0);
+    // The app may be mounted under a path prefix (see wsgi.py)
+    var config = document.getElementById('_dash-config');
+    var prefix = (config && JSON.parse(config.textContent).requests_pathname_prefix) || '/';
+    function attach() {
+        var outer = document.getElementById(domId);
+        var gd = outer && outer.querySelector('.js-plotly-plot');
+        if (!gd || !gd.on) { return window.requestAnimationFrame(attach); }
+        var onPlot = function() {
+            gd.removeListener('plotly_afterplot', onPlot);
+            var entry = {graph: domId, mode: meta.render_mode || 'svg', points: points,
+                         ms: performance.now() - start};
+            window.renderTimings = window.renderTimings || [];
+            window.renderTimings.push(entry);
+            navigator.sendBeacon(prefix + 'render-timings', JSON.stringify(entry));
+        };
+        gd.on('plotly_afterplot', onPlot);
+    }
+    attach();
+    return start;
+}
+"""
+
+
+def valid_timing(entry):
+    """The fields kept from a reported render timing, or None if it is malformed"""
+    if not isinstance(entry, dict):
+        return None
+    ms, mode, points = entry.get('ms'), entry.get('mode'), entry.get('points')
+    if isinstance(ms, bool) or not isinstance(ms, (int, float)) or not 0 <= ms < float('inf'):
+        return None
+    if mode not in RENDER_MODES:
+        return None
+    graph = entry.get('graph')
+    return {'graph': graph[:200] if isinstance(graph, str) else None, 'mode': mode,
+            'points': points if isinstance(points, int) and not isinstance(points, bool) else None,
+            'ms': float(ms)}
+
+
+def _timing_store_id(graph_id):
+    if isinstance(graph_id, dict):
+        return {**graph_id, 'type': f"{graph_id['type']}-render-start"}
+    return f'{graph_id}-render-start'
+
+
+def timing_store(graph_id):
+    """The dcc.Store that register_render_timing writes to; add it next to the graph"""
+    return dcc.Store(id=_timing_store_id(graph_id))
+
+
+def register_render_timing(app, graph_id):
+    """Measure client render time of a graph and collect it at /render-timings
+
+    graph_id may be a string or a pattern-matching dict id; pass the dict
+    with MATCH in place of the per-card index.
+    """
+    app.clientside_callback(RENDER_TIMING_JS,
+                            Output(_timing_store_id(graph_id), 'data'),
+                            Input(graph_id, 'figure'),
+                            State(graph_id, 'id'))
+
+    if 'render_timings' in app.server.view_functions:
+        return
+
+    @app.server.route('/render-timings', methods=['GET', 'POST'])
+    def render_timings():
+        if request.method == 'POST':
+            entry = valid_timing(request.get_json(force=True, silent=True))
+            if entry is None:
+                return '', 400
+            RENDER_TIMINGS.append(entry)
+            return '', 204
+        summary = {}
+        for mode in {entry.get('mode') for entry in RENDER_TIMINGS}:
+            times = [entry['ms'] for entry in RENDER_TIMINGS if entry.get('mode') == mode]
+            summary[mode] = {'count': len(times), 'mean_ms': statistics.fmean(times),
+                             'median_ms': statistics.median(times), 'max_ms': max(times)}
+        return jsonify(summary)
@@ -0,0 +1,169 @@
+import os
+import sys
+import json
+import html
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+import plotly.io as pio
+from plotly.offline import get_plotlyjs, get_plotlyjs_version
+import stock_figures
+from figure_encoding import encode_figure
+from downsampling import downsample_view
+from panel_store import PANEL_DIR, open_panel
+from price_store import get_many_histories, period_start
+
+# Static per-ticker chart pages; every page loads the one plotly.js file
+# written next to them instead of inlining its own 3.5 MB copy
+REPORT_DIR = os.environ.get('REPORT_DIR', './reports')
+PLOTLYJS_FILE = 'plotly.min.js'
+MANIFEST_FILE = 'manifest.json'
+
+# Bump when the page layout changes so every page is rendered again
+REPORT_VERSION = 2
+
+
+def data_hash(bars):
+    """Hash of the bars a page is rendered from"""
+    digest = hashlib.sha1(f"v{REPORT_VERSION}".encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(bars, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def panel_histories(symbols=None, panel_dir=PANEL_DIR, period=None):
+    """Per-ticker Open/High/Low/Close frames from the S&P 500 panel"""
+    panel = open_panel(panel_dir)
+    symbols = [s for s in symbols if s in set(panel.tickers)] if symbols else panel.tickers
+    start = period_start(period, panel.dates[-1]) if period and period != 'max' else None
+    dates = panel.dates_between(start)
+    fields = {field: panel.array(field, symbols, start) for field in ['open', 'high', 'low', 'close']}
+    histories = {}
+    for i, symbol in enumerate(symbols):
+        bars = pd.DataFrame({field.capitalize(): values[:, i] for field, values in fields.items()}, index=dates)
+        histories[symbol] = bars.dropna()
+    return histories
+
+
+def load_histories(source, symbols, period):
+    if source == 'panel':
+        return panel_histories(symbols, period=period)
+    return get_many_histories(symbols, period)
+
+
+def render_page(symbol, bars, path):
+    """Render one ticker's chart page; runs in a worker process"""
+    rsi = stock_figures.calculate_rsi(bars)
+    ma20, ma60, ma200 = stock_figures.calculate_moving_averages(bars)
+    candles, lines = downsample_view(bars, {'20 MA': ma20, '60 MA': ma60, '200 MA': ma200, 'RSI': rsi})
+    fig = stock_figures.build_figure(symbol, stock_figures.build_traces(candles, lines))
+    tmp_path = f"{path}.tmp"
+    # Rounded numbers and short dates, as the app sends them
+    pio.write_html(encode_figure(fig), tmp_path, include_plotlyjs=PLOTLYJS_FILE,
+                   full_html=True, validate=False)
+    os.replace(tmp_path, path)
+    return symbol
+
+
+def read_manifest(report_dir):
+    try:
+        with open(os.path.join(report_dir, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def write_manifest(report_dir, manifest):
+    path = os.path.join(report_dir, MANIFEST_FILE)
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(f"{path}.tmp", path)
+
+
+def write_plotlyjs(report_dir):
+    """Write the shared plotly.js bundle once per plotly version"""
+    path = os.path.join(report_dir, PLOTLYJS_FILE)
+    version = get_plotlyjs_version()
+    marker = f"{path}.version"
+    if os.path.exists(path) and os.path.exists(marker):
+        with open(marker, 'r', encoding='utf-8') as f:
+            if f.read().strip() == version:
+                return
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(get_plotlyjs())
+    with open(marker, 'w', encoding='utf-8') as f:
+        f.write(version)
+
+
+def write_index(report_dir, symbols):
+    links = '\n'.join(f'<li><a href="{html.escape(s)}.html">{html.escape(s)}</a></li>' for s in sorted(symbols))
+    with open(os.path.join(report_dir, 'index.html'), 'w', encoding='utf-8') as f:
+        f.write(f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>Stock reports</title></head>\n"
+                f"<body><h1>Stock reports</h1>\n<ul>\n{links}\n</ul></body></html>\n")
+
+
+def export_reports(symbols=None, report_dir=REPORT_DIR, source='panel', period='5y', max_workers=None, force=False):
+    """Render a chart page per ticker into report_dir, skipping unchanged data
+
+    Returns a dict with the rendered, skipped and failed tickers.
+    """
+    os.makedirs(report_dir, exist_ok=True)
+    write_plotlyjs(report_dir)
+    manifest = read_manifest(report_dir)
+
+    # Hash in the parent, so only pages whose data changed go to the pool
+    jobs = {}
+    skipped = []
+    for symbol, bars in load_histories(source, symbols, period).items():
+        if bars.empty:
+            continue
+        digest = data_hash(bars)
+        path = os.path.join(report_dir, f"{symbol}.html")
+        if not force and manifest.get(symbol) == digest and os.path.exists(path):
+            skipped.append(symbol)
+        else:
+            jobs[symbol] = (bars, path, digest)
+
+    rendered, failed = [], {}
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(render_page, symbol, bars, path): symbol for symbol, (bars, path, _) in jobs.items()}
+        for future in as_completed(futures):
+            symbol = futures[future]
+            try:
+                future.result()
+                manifest[symbol] = jobs[symbol][2]
+                rendered.append(symbol)
+            except Exception as e:
+                failed[symbol] = str(e)
+                manifest.pop(symbol, None)
+
+    write_manifest(report_dir, manifest)
+    write_index(report_dir, [symbol for symbol in manifest
+                             if os.path.exists(os.path.join(report_dir, f"{symbol}.html"))])
+    return {'rendered': sorted(rendered), 'skipped': sorted(skipped), 'failed': failed}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Export static per-ticker chart pages')
+    parser.add_argument('symbols', nargs='*', help='tickers to export (default: every panel ticker)')
+    parser.add_argument('--out', default=REPORT_DIR, help='report directory')
+    parser.add_argument('--source', choices=['panel', 'store'], default='panel',
+                        help='S&P 500 panel or the per-ticker price store')
+    parser.add_argument('--period', default='5y')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--force', action='store_true', help='render every page even if unchanged')
+    args = parser.parse_args(argv)
+
+    if args.source == 'store' and not args.symbols:
+        parser.error('--source store needs a list of symbols')
+
+    result = export_reports(args.symbols or None, args.out, args.source, args.period, args.workers, args.force)
+    print(f"Rendered {len(result['rendered'])}, skipped {len(result['skipped'])} unchanged, "
+          f"failed {len(result['failed'])}")
+    for symbol, error in result['failed'].items():
+        print(f"  {symbol}: {error}")
+    return 1 if result['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+import os
+import json
+import hashlib
+import threading
+import unicodedata
+import diskcache
+
+# Completed chatbot replies, under the chatbot's ./cache directory. The
+# cache has its own size limit, so filling it up never evicts the
+# background callback results stored in ./cache itself.
+RESPONSE_CACHE_DIR = './cache/responses'
+RESPONSE_CACHE_SIZE = 128 * 1024 * 1024
+RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', 24 * 60 * 60))
+
+# Replies sampled at temperature > 0 differ from call to call; set
+# RESPONSE_CACHE_SAMPLED=0 to only cache deterministic (temperature 0) ones
+CACHE_SAMPLED = os.environ.get('RESPONSE_CACHE_SAMPLED', '1') != '0'
+
+
+def normalize_text(text):
+    """Unicode NFC with runs of whitespace collapsed, so trivially different prompts share a key"""
+    return ' '.join(unicodedata.normalize('NFC', text).split())
+
+
+class ResponseCache:
+    """Persistent cache of completion text keyed by (model, temperature, messages)
+
+    Entries expire after ttl seconds, and the least recently used ones are
+    evicted once the cache outgrows size_limit. Hit and miss counts are kept
+    by diskcache itself, so stats() covers every process sharing the cache.
+    """
+
+    def __init__(self, cache_dir=RESPONSE_CACHE_DIR, size_limit=RESPONSE_CACHE_SIZE,
+                 ttl=RESPONSE_CACHE_TTL, cache_sampled=CACHE_SAMPLED):
+        self.ttl = ttl
+        self.cache_sampled = cache_sampled
+        self.disk = diskcache.Cache(cache_dir, size_limit=size_limit,
+                                    eviction_policy='least-recently-used')
+        self.disk.stats(enable=True)
+        self._lock = threading.Lock()
+        self.skipped = 0
+
+    @staticmethod
+    def make_key(messages, model, temperature, **params):
+        normalized = {
+            'model': model.strip().lower(),
+            'temperature': round(float(temperature), 2),
+            'messages': [[m['role'], normalize_text(m['content'])] for m in messages],
+            'params': params
+        }
+        digest = hashlib.sha256(json.dumps(normalized, sort_keys=True).encode('utf-8')).hexdigest()
+        return f"response:{digest}"
+
+    def cacheable(self, temperature):
+        return self.cache_sampled or not temperature
+
+    def get(self, messages, model, temperature, **params):
+        """Return the cached reply, or None"""
+        if not self.cacheable(temperature):
+            with self._lock:
+                self.skipped += 1
+            return None
+        return self.disk.get(self.make_key(messages, model, temperature, **params))
+
+    def set(self, messages, reply, model, temperature, **params):
+        if self.cacheable(temperature):
+            self.disk.set(self.make_key(messages, model, temperature, **params), reply, expire=self.ttl)
+
+    def stats(self):
+        hits, misses = self.disk.stats()
+        lookups = hits + misses
+        with self._lock:
+            skipped = self.skipped
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / lookups if lookups else 0.0,
+            'skipped': skipped,
+            'entries': len(self.disk),
+            'bytes': self.disk.volume(),
+            'size_limit': self.disk.size_limit
+        }
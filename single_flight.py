@@ -0,0 +1,145 @@
+import os
+import time
+import hashlib
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Lock files used to coalesce work across worker processes
+LOCK_DIR = './cache/locks'
+
+# Keys are hashed onto a fixed set of lock files so the directory stays bounded
+LOCK_STRIPES = 1024
+
+# Every SingleFlight by name, for stats()
+_registry = {}
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _FileLock:
+    """Exclusive lock on a local file, shared by every process on the machine"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def acquire(self, blocking=True):
+        self.file = open(self.path, 'a+')
+        while True:
+            try:
+                if fcntl is not None:
+                    fcntl.flock(self.file.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+                else:
+                    msvcrt.locking(self.file.fileno(), msvcrt.LK_NBLCK, 1)
+                return True
+            except OSError:
+                if not blocking:
+                    self.file.close()
+                    self.file = None
+                    return False
+                time.sleep(0.05)
+
+    def release(self):
+        if fcntl is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+        else:
+            self.file.seek(0)
+            msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+        self.file.close()
+        self.file = None
+
+
+class SingleFlight:
+    """Coalesce concurrent identical jobs into one execution
+
+    Within a process, callers asking for a key that is already in flight
+    wait for that job and share its result. Across processes the leader
+    holds a lock file for the key, so a second worker blocks until the
+    first is done; the job should then find its work already in a shared
+    store (price store, disk cache) and return without refetching.
+    """
+
+    def __init__(self, name, lock_dir=LOCK_DIR):
+        self.name = name
+        self.lock_dir = lock_dir
+        if lock_dir:
+            os.makedirs(lock_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.calls = 0
+        self.executed = 0
+        self.thread_shared = 0
+        self.process_waits = 0
+        _registry[name] = self
+
+    def _lock_path(self, key):
+        digest = hashlib.sha1(f"{self.name}:{key}".encode('utf-8')).hexdigest()
+        return os.path.join(self.lock_dir, f"{self.name}-{int(digest, 16) % LOCK_STRIPES}.lock")
+
+    def _run(self, key, fn):
+        if not self.lock_dir:
+            return fn()
+        lock = _FileLock(self._lock_path(key))
+        if not lock.acquire(blocking=False):
+            # Another process is running the same job; wait for it to finish
+            with self._lock:
+                self.process_waits += 1
+            lock.acquire()
+        try:
+            return fn()
+        finally:
+            lock.release()
+
+    def do(self, key, fn):
+        """Run fn() for key, or wait for the identical call already in flight"""
+        with self._lock:
+            self.calls += 1
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+                self.executed += 1
+            else:
+                self.thread_shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._run(key, fn)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'executed': self.executed,
+                'deduplicated': self.thread_shared,
+                'waited_on_other_process': self.process_waits,
+                'in_flight': len(self._inflight)
+            }
+
+
+def stats():
+    """Return stats for every SingleFlight in this process"""
+    return {name: flight.stats() for name, flight in _registry.items()}
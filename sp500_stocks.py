@@ -1,33 +1,203 @@
+import os
+import sys
+import json
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import pandas as pd
-import datetime
-import numpy as np
 import yfinance as yf
-import pandas_ta
+from price_store import write_partition, split_batch
+from panel_store import PANEL_DIR, open_panel, panel_exists, build_from_partitions, convert_pickle, convert_json
+from panel_indicators import compute_panel_indicators, to_long
 
+# Per-ticker partitions and the job checkpoint live here
+DATA_DIR = os.environ.get('SP500_DATA_DIR', './data/sp500')
 
-def loadData():
+# Append-only checkpoint: a JSON header line describing the job, then one
+# completed ticker per line
+CHECKPOINT_FILE = '_checkpoint.log'
+
+
+def loadSymbols():
+    """Scrape the current S&P 500 constituent list"""
     sp500 = pd.read_html('https://en.wikipedia.org/wiki/List_of_S%26P_500_companies')[0]
     sp500['Symbol'] = sp500['Symbol'].str.replace('.', '-')
     symbols = sp500['Symbol'].unique().tolist()
     symbols.sort()
-    symbols = symbols[:5]
-    end_date = '2025-02-21'
-    start_date = pd.to_datetime(end_date) - pd.DateOffset(365*5)
-    df = yf.download(tickers=symbols,  interval="1d",start=start_date, end=end_date)
-    df = df.stack()
-    df.columns = df.columns.str.lower()
-    df.to_pickle('D:/Development/finance/sp500_data.pkl')
-    #df.to_json('D:/Development/finance/sp500_json.json')
-    #df.to_csv('D:/Development/finance/sp500.csv')
-
-def loadFromLocal():
-    df = pd.read_pickle('D:/Development/finance/sp500_data.pkl')
-    # Garman Klass Volatility
-    df['Garman_Klass_vol'] = (np.log(df['high']) - np.log(df['low']))**2 - (2*np.log(2) - 1)*((np.log(df['close']) - np.log(df['open']))**2)
-
-    df['RSI'] = df.groupby(level=1)['close'].transform(lambda x: pandas_ta.rsi(close = x, length = 20))
-    closeSeries = df['close']
-    a = pandas_ta.rsi(closeSeries, length = 20)
+    return symbols
+
+
+def readCheckpoint(data_dir=DATA_DIR):
+    """Return (job header, completed tickers) from the checkpoint, or (None, set())"""
+    path = os.path.join(data_dir, CHECKPOINT_FILE)
+    if not os.path.exists(path):
+        return None, set()
+    with open(path, 'r', encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    if not lines:
+        return None, set()
+    return json.loads(lines[0]), {line for line in lines[1:] if line}
+
+
+def _startCheckpoint(data_dir, job):
+    os.makedirs(data_dir, exist_ok=True)
+    with open(os.path.join(data_dir, CHECKPOINT_FILE), 'w', encoding='utf-8') as f:
+        f.write(json.dumps(job) + '\n')
+
+
+def downloadWithRetry(symbols, start_date, end_date, retries=4, backoff=2.0):
+    """Download a batch of symbols, retrying with exponential backoff and jitter
+
+    yf.download reports most failures, rate limits included, as empty or
+    all-NaN frames rather than exceptions, so symbols that come back without
+    data are retried as well; each retry asks only for those. Returns a
+    frame per symbol, empty for symbols that never returned data.
+    """
+    frames = {symbol: pd.DataFrame() for symbol in symbols}
+    pending = list(symbols)
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(backoff * 2 ** (attempt - 1) + random.uniform(0, backoff))
+        try:
+            df = yf.download(tickers=pending, interval="1d", start=start_date, end=end_date,
+                             group_by='ticker', progress=False, threads=False)
+            frames.update(split_batch(df, pending))
+        except Exception:
+            # Only give up with an error if no attempt got any data
+            if attempt == retries and len(pending) == len(symbols):
+                raise
+            continue
+        pending = [symbol for symbol in pending if frames[symbol].empty]
+        if not pending:
+            break
+    return frames
+
+
+def downloadChunk(chunk, start_date, end_date, data_dir, on_done):
+    """Download one chunk of tickers and write a partition per ticker
+
+    Returns the tickers that still have no data after every retry.
+    """
+    frames = downloadWithRetry(chunk, start_date, end_date)
+    missing = []
+    for symbol in chunk:
+        df = frames.get(symbol, pd.DataFrame())
+        if df.empty:
+            missing.append(symbol)
+            continue
+        df = df.copy()
+        df.columns = df.columns.str.lower()
+        df.index.name = 'Date'
+        write_partition(symbol, df, data_dir)
+        on_done(symbol)
+    return missing
+
+
+def loadData(data_dir=DATA_DIR, end_date=None, years=5, chunk_size=25, max_workers=4, restart=False,
+             panel_dir=PANEL_DIR):
+    """Download daily bars for the full S&P 500 into a per-ticker store
+
+    The job is resumable: every finished ticker is appended to a checkpoint
+    in data_dir, and a rerun skips tickers already recorded. Without an
+    explicit end_date an unfinished job keeps the dates it started with.
+    Once the download finishes the memory-mapped panel is rebuilt.
+    """
+    job, done = (None, set()) if restart else readCheckpoint(data_dir)
+    if job is None or (end_date is not None and job['end'] != str(end_date)):
+        end = pd.to_datetime(end_date) if end_date else pd.Timestamp.today().normalize()
+        job = {
+            'start': str((end - pd.DateOffset(years=years)).date()),
+            'end': str(end.date())
+        }
+        done = set()
+        _startCheckpoint(data_dir, job)
+
+    symbols = loadSymbols()
+    pending = [symbol for symbol in symbols if symbol not in done]
+    print(f"{len(done)} tickers already stored, {len(pending)} to download")
+
+    checkpoint = open(os.path.join(data_dir, CHECKPOINT_FILE), 'a', encoding='utf-8')
+    lock = threading.Lock()
+
+    def markDone(symbol):
+        with lock:
+            checkpoint.write(symbol + '\n')
+            checkpoint.flush()
+
+    chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+    failed = []
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {
+                pool.submit(downloadChunk, chunk, job['start'], job['end'], data_dir, markDone): chunk
+                for chunk in chunks
+            }
+            for future in as_completed(futures):
+                chunk = futures[future]
+                try:
+                    failed.extend(future.result())
+                except Exception as e:
+                    print(f"Chunk {chunk[0]}..{chunk[-1]} failed: {e}")
+                    failed.extend(chunk)
+                # Make the chunk's checkpoint entries durable before moving on
+                with lock:
+                    os.fsync(checkpoint.fileno())
+    finally:
+        checkpoint.close()
+
+    if failed:
+        print(f"No data for {len(failed)} tickers, rerun to retry: {', '.join(sorted(failed))}")
+
+    _, done = readCheckpoint(data_dir)
+    if not build_from_partitions(done, data_dir, panel_dir):
+        print("No tickers stored yet, so no panel was built")
+    return failed
+
+
+def buildLocalPanel(panel_dir=PANEL_DIR, pickle_path='sp500_data.pkl', json_path='sp500_json.json'):
+    """Build the panel from the data bundled with the repo
+
+    The pickle needs a numpy at least as new as the one that wrote it, so
+    the JSON copy of the same data is used when it cannot be read.
+    """
+    if os.path.exists(pickle_path):
+        try:
+            print(f"No panel in {panel_dir}, converting {pickle_path}")
+            convert_pickle(pickle_path, panel_dir)
+            return
+        except (ImportError, AttributeError) as e:
+            if not os.path.exists(json_path):
+                raise
+            print(f"Could not read {pickle_path} ({e})")
+    if not os.path.exists(json_path):
+        # A full download takes a while, so it only runs when asked for
+        raise FileNotFoundError(
+            f"No panel in {panel_dir} and no {pickle_path} or {json_path} to build it from; "
+            f"run 'python sp500_stocks.py download' to download the S&P 500")
+    print(f"No panel in {panel_dir}, converting {json_path}")
+    convert_json(json_path, panel_dir)
+
+
+def loadFromLocal(panel_dir=PANEL_DIR, tickers=None, start=None, end=None):
+    # A fresh checkout has no panel yet: build it from the bundled data
+    if not panel_exists(panel_dir):
+        buildLocalPanel(panel_dir)
+
+    # Memory-mapped panel: only the requested tickers and dates are read
+    panel = open_panel(panel_dir)
+    df = panel.to_long(tickers=tickers, start=start, end=end)
+
+    # Garman Klass volatility, RSI and moving averages for every ticker in one
+    # vectorized pass over the wide panel, then joined onto the long frame
+    indicators = compute_panel_indicators(panel, tickers, start, end)
+    dates = panel.dates_between(start, end)
+    df = df.join(to_long(indicators, dates, tickers or panel.tickers))
     print(df)
-#loadData()
-loadFromLocal()
\ No newline at end of file
+    return df
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'download':
+        loadData()
+    loadFromLocal()
@@ -1,13 +1,15 @@
 import dash
 from dash import dcc, html
-from dash.dependencies import Input, Output, State
+from dash.dependencies import Input, Output, State, MATCH
 import plotly.graph_objs as go
-import pandas as pd
-import yfinance as yf
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from price_store import get_history, get_many_histories
+import single_flight
+from render_mode import price_traces, line_trace, figure_render_mode, timing_store, register_render_timing
+from figure_encoding import encode_figure
 
 # Initialize the Dash app
-app = dash.Dash(__name__)
+app = dash.Dash(__name__, compress=True)
 
 # Define the layout
 app.layout = html.Div([
@@ -48,7 +50,104 @@ app.layout = html.Div([
 ])
 
 
-# Callback to update the graphs based on user input
+CARD_STYLE = {'width': '48%', 'margin': '1%', 'backgroundColor': '#f8f9fa', 'padding': '10px',
+              'borderRadius': '5px'}
+
+# Downloads for an update run in this pool, off the request threads, so
+# update_graphs can return the placeholders right away
+CARD_WORKERS = 4
+card_pool = ThreadPoolExecutor(max_workers=CARD_WORKERS, thread_name_prefix='chart-card')
+
+
+def build_chart_card(symbol, df, time_period):
+    """Build the chart card for one symbol from its downloaded prices"""
+    if df.empty:
+        return html.Div([
+            html.H3(f"No data found for {symbol}"),
+        ], style=CARD_STYLE)
+
+    # Create the candlestick chart (GL line-segment OHLC bars for large series)
+    candlestick = price_traces(df.index, df['Open'], df['High'], df['Low'], df['Close'],
+                               name='Price', increasing_color='#3D9970',
+                               decreasing_color='#FF4136')
+
+    # Create the moving averages
+    ma50 = line_trace(
+        x=df.index,
+        y=df['Close'].rolling(window=50).mean(),
+        line=dict(color='orange', width=2),
+        name='50-day MA'
+    )
+
+    ma200 = line_trace(
+        x=df.index,
+        y=df['Close'].rolling(window=200).mean(),
+        line=dict(color='red', width=2),
+        name='200-day MA'
+    )
+
+    # Create the figure
+    fig = go.Figure(data=[*candlestick, ma50, ma200])
+
+    # Calculate performance metrics
+    start_price = df['Close'].iloc[0]
+    end_price = df['Close'].iloc[-1]
+    percent_change = ((end_price - start_price) / start_price) * 100
+
+    # Update layout
+    fig.update_layout(
+        title=f"{symbol} ({time_period}): {percent_change:.2f}%",
+        height=400,
+        margin=dict(l=50, r=50, t=50, b=50),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="center", x=0.5)
+    )
+    figure_render_mode(fig)
+
+    graph_id = {'type': 'stock-chart', 'index': symbol}
+    return html.Div([
+        dcc.Graph(id=graph_id, figure=encode_figure(fig)),
+        timing_store(graph_id),
+        html.Div([
+            html.Div([
+                html.P(f"Start: ${start_price:.2f}", style={'margin': '5px'}),
+                html.P(f"End: ${end_price:.2f}", style={'margin': '5px'}),
+            ], style={'display': 'flex', 'justifyContent': 'space-between'}),
+            html.P(f"Change: {percent_change:.2f}%",
+                   style={'margin': '5px', 'fontWeight': 'bold',
+                          'color': 'green' if percent_change >= 0 else 'red',
+                          'textAlign': 'center'})
+        ], style={'backgroundColor': '#f8f9fa', 'padding': '10px', 'borderRadius': '5px'})
+    ], style={'width': '48%', 'margin': '1%'})
+
+
+def error_card(symbol, message):
+    return html.Div([
+        html.H3(f"Error loading data for {symbol}"),
+        html.P(message)
+    ], style=CARD_STYLE)
+
+
+def prefetch_histories(symbols, time_period):
+    """Download the symbols missing from the price store in one batch
+
+    Each symbol is marked in the store while it downloads, so a card asking
+    for it waits for this batch instead of downloading it again, and is
+    served as soon as its own data is written.
+    """
+    try:
+        get_many_histories(symbols, period=time_period)
+    except Exception:
+        # Cards whose symbols are still missing download them on their own
+        pass
+
+
+def load_chart_card(symbol, time_period):
+    """Fetch one symbol from the price store and build its card"""
+    return build_chart_card(symbol, get_history(symbol, period=time_period), time_period)
+
+
+# Callback to update the graphs based on user input: lays out a placeholder
+# per symbol right away; each card then loads on its own below
 @app.callback(
     Output('charts-container', 'children'),
     [Input('update-button', 'n_clicks')],
@@ -60,112 +159,49 @@ def update_graphs(n_clicks, stock_symbols_input, time_period):
         return html.Div("Please enter at least one stock symbol.")
 
     # Parse multiple stock symbols
-    stock_symbols = [symbol.strip() for symbol in stock_symbols_input.split(',')]
-
-    # Limit to 4 stocks if more are provided
-    if len(stock_symbols) > 4:
-        stock_symbols = stock_symbols[:4]
-
-    # Map dropdown values to datetime periods
-    period_map = {
-        '1mo': 30,
-        '3mo': 90,
-        '6mo': 180,
-        '1y': 365,
-        '5y': 1825
-    }
-
-    days = period_map[time_period]
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=days)
-
-    charts = []
-
-    for symbol in stock_symbols:
-        if not symbol:
-            continue
-
-        try:
-            # Download stock data
-            df = yf.download(symbol, start=start_date, end=end_date)
-
-            if df.empty:
-                charts.append(html.Div([
-                    html.H3(f"No data found for {symbol}"),
-                ], style={'width': '48%', 'margin': '1%', 'backgroundColor': '#f8f9fa', 'padding': '10px',
-                          'borderRadius': '5px'}))
-                continue
-
-            # Create the candlestick chart
-            candlestick = go.Candlestick(
-                x=df.index,
-                open=df['Open'],
-                high=df['High'],
-                low=df['Low'],
-                close=df['Close'],
-                name='Price'
-            )
-
-            # Create the moving averages
-            ma50 = go.Scatter(
-                x=df.index,
-                y=df['Close'].rolling(window=50).mean(),
-                line=dict(color='orange', width=2),
-                name='50-day MA'
-            )
-
-            ma200 = go.Scatter(
-                x=df.index,
-                y=df['Close'].rolling(window=200).mean(),
-                line=dict(color='red', width=2),
-                name='200-day MA'
-            )
-
-            # Create the figure
-            fig = go.Figure(data=[candlestick, ma50, ma200])
-
-            # Calculate performance metrics
-            start_price = df['Close'].iloc[0]
-            end_price = df['Close'].iloc[-1]
-            percent_change = ((end_price - start_price) / start_price) * 100
-
-            # Update layout
-            fig.update_layout(
-                title=f"{symbol} ({time_period}): {percent_change:.2f}%",
-                height=400,
-                margin=dict(l=50, r=50, t=50, b=50),
-                legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="center", x=0.5)
-            )
-
-            # Add the chart to our list
-            chart_div = html.Div([
-                dcc.Graph(figure=fig),
-                html.Div([
-                    html.Div([
-                        html.P(f"Start: ${start_price:.2f}", style={'margin': '5px'}),
-                        html.P(f"End: ${end_price:.2f}", style={'margin': '5px'}),
-                    ], style={'display': 'flex', 'justifyContent': 'space-between'}),
-                    html.P(f"Change: {percent_change:.2f}%",
-                           style={'margin': '5px', 'fontWeight': 'bold',
-                                  'color': 'green' if percent_change >= 0 else 'red',
-                                  'textAlign': 'center'})
-                ], style={'backgroundColor': '#f8f9fa', 'padding': '10px', 'borderRadius': '5px'})
-            ], style={'width': '48%', 'margin': '1%'})
-
-            charts.append(chart_div)
-
-        except Exception as e:
-            charts.append(html.Div([
-                html.H3(f"Error loading data for {symbol}"),
-                html.P(str(e))
-            ], style={'width': '48%', 'margin': '1%', 'backgroundColor': '#f8f9fa', 'padding': '10px',
-                      'borderRadius': '5px'}))
-
-    # If no valid charts were created
-    if not charts:
+    stock_symbols = [symbol.strip().upper() for symbol in stock_symbols_input.split(',')]
+    stock_symbols = list(dict.fromkeys(symbol for symbol in stock_symbols if symbol))
+
+    # If no valid symbols were entered
+    if not stock_symbols:
         return html.Div("No valid stock data found. Please check the symbols and try again.")
 
-    return charts
+    # Start the batch download now; the cards read their symbol as it lands
+    card_pool.submit(prefetch_histories, stock_symbols, time_period)
+
+    return [
+        html.Div(id={'type': 'stock-card', 'index': symbol}, children=[
+            html.P(f"Loading {symbol}...", style={'textAlign': 'center', 'color': '#666'}),
+            dcc.Store(id={'type': 'card-request', 'index': symbol},
+                      data={'symbol': symbol, 'period': time_period, 'request': n_clicks})
+        ], style=CARD_STYLE)
+        for symbol in stock_symbols
+    ]
+
+
+# One request per card, so each chart appears as soon as its data is in and
+# errors stay in their own card; the download itself is shared (prefetch_histories)
+@app.callback(
+    [Output({'type': 'stock-card', 'index': MATCH}, 'children'),
+     Output({'type': 'stock-card', 'index': MATCH}, 'style')],
+    [Input({'type': 'card-request', 'index': MATCH}, 'data')]
+)
+def update_card(request):
+    symbol, time_period = request['symbol'], request['period']
+    try:
+        card = load_chart_card(symbol, time_period)
+    except Exception as e:
+        card = error_card(symbol, str(e))
+    return card.children, card.style
+
+
+# Report client render time of every chart card to /render-timings
+register_render_timing(app, {'type': 'stock-chart', 'index': MATCH})
+
+
+@app.server.route('/coalesce-stats')
+def coalesce_stats():
+    return single_flight.stats()
 
 
 # Run the app
@@ -0,0 +1,144 @@
+from plotly.subplots import make_subplots
+from render_mode import price_traces, line_trace, figure_render_mode
+
+# Indicators and the candlestick/RSI figure of stock_visualization, apart
+# from its Dash app, so report_export's worker processes can build pages
+# without creating the app, its caches and its callbacks.
+
+def calculate_rsi(data, periods=14):
+    """Calculate RSI for a given price series"""
+    close_delta = data['Close'].diff()
+    
+    # Make two series: one for lower closes and one for higher closes
+    up = close_delta.clip(lower=0)
+    down = -1 * close_delta.clip(upper=0)
+    
+    # Calculate the EWMA
+    ma_up = up.ewm(com=periods - 1, adjust=True, min_periods=periods).mean()
+    ma_down = down.ewm(com=periods - 1, adjust=True, min_periods=periods).mean()
+    
+    rsi = ma_up / ma_down
+    rsi = 100 - (100/(1 + rsi))
+    return rsi
+
+def calculate_moving_averages(data):
+    """Calculate moving averages for the price data"""
+    ma20 = data['Close'].rolling(window=20).mean()
+    ma60 = data['Close'].rolling(window=60).mean()
+    ma200 = data['Close'].rolling(window=200).mean()
+    return ma20, ma60, ma200
+
+def build_traces(candles, lines, mode=None, n_points=None):
+    """Build the price, moving average and RSI traces as (trace, subplot row) pairs
+
+    candles holds Open/High/Low/Close columns; lines maps the trace names
+    '20 MA', '60 MA', '200 MA' and 'RSI' to time-indexed series. mode
+    overrides the render mode ('svg' or 'webgl'); n_points is the number
+    of bars in view before downsampling, which the renderer is chosen by.
+    """
+    # Add candlestick chart (GL line-segment OHLC bars for large series)
+    traces = [(trace, 1) for trace in price_traces(
+        candles.index, candles['Open'], candles['High'], candles['Low'], candles['Close'],
+        name='Price', mode=mode, n_points=n_points, increasing_color='#26a69a', decreasing_color='#ef5350')]
+
+    # Add Moving Averages
+    traces.append((
+        line_trace(
+            x=lines['20 MA'].index,
+            y=lines['20 MA'],
+            name='20 MA',
+            mode=mode,
+            n_points=n_points,
+            line=dict(color='#1976D2', width=1.5)
+        ), 1))
+
+    traces.append((
+        line_trace(
+            x=lines['60 MA'].index,
+            y=lines['60 MA'],
+            name='60 MA',
+            mode=mode,
+            n_points=n_points,
+            line=dict(color='#FB8C00', width=1.5)
+        ), 1))
+
+    traces.append((
+        line_trace(
+            x=lines['200 MA'].index,
+            y=lines['200 MA'],
+            name='200 MA',
+            mode=mode,
+            n_points=n_points,
+            line=dict(color='#E91E63', width=1.5)
+        ), 1))
+
+    # Add RSI
+    traces.append((
+        line_trace(
+            x=lines['RSI'].index,
+            y=lines['RSI'],
+            name='RSI',
+            mode=mode,
+            n_points=n_points,
+            line=dict(color='#2962ff', width=2)
+        ), 2))
+    return traces
+
+def build_figure(ticker_symbol, traces):
+    """Build the full candlestick, moving average and RSI figure"""
+    # Create subplot with secondary y-axis
+    fig = make_subplots(rows=2, cols=1, 
+                       shared_xaxes=True,
+                       vertical_spacing=0.03,
+                       row_heights=[0.7, 0.3])
+
+    for trace, row in traces:
+        fig.add_trace(trace, row=row, col=1)
+
+    # Set RSI y-axis range from 0 to 100
+    fig.update_yaxes(range=[0, 100], row=2, col=1)
+    # Add border frame to RSI subplot
+    fig.update_xaxes(showline=True, linewidth=5, linecolor='#2c3e50', row=2, col=1)
+    fig.update_yaxes(showline=True, linewidth=5, linecolor='#2c3e50', row=2, col=1)
+    fig.update_layout(
+        xaxis_showgrid=True,
+        yaxis_showgrid=True,
+        xaxis_zeroline=False,
+        yaxis_zeroline=False,
+        plot_bgcolor='grey'
+    )
+
+    # Add RSI overbought/oversold lines
+    fig.add_hline(y=70, line_color='#ef5350', line_dash='dash', row=2, col=1)
+    fig.add_hline(y=30, line_color='#26a69a', line_dash='dash', row=2, col=1)
+    
+    # Update layout
+    fig.update_layout(
+        title=f'{ticker_symbol} Stock Price and RSI',
+        yaxis_title='Stock Price (USD)',
+        yaxis2_title='RSI',
+        template='plotly_white',
+        xaxis_rangeslider_visible=False,
+        height=800,
+        showlegend=True,
+        plot_bgcolor='white',
+        paper_bgcolor='white',
+        font=dict(color='#2c3e50'),
+        legend=dict(
+            yanchor="top",
+            y=0.99,
+            xanchor="left",
+            x=0.01,
+            bgcolor='rgba(255, 255, 255, 0.8)'
+        )
+    )
+
+    # Update y-axes labels and styling
+    fig.update_yaxes(title_text="Price", row=1, col=1, gridcolor='#eee')
+    fig.update_yaxes(title_text="RSI", row=2, col=1, gridcolor='#eee')
+    fig.update_xaxes(gridcolor='#eee')
+    return figure_render_mode(fig)
+
+def figure_skeleton(traces):
+    """Describe the trace structure a figure needs; Patch only applies to a matching one"""
+    return [trace.type for trace, _ in traces]
@@ -1,25 +1,41 @@
-import yfinance as yf
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import dash
-from dash import html, dcc
-from dash.dependencies import Input, Output
-import pandas as pd
-import numpy as np
-from datetime import datetime, timedelta
+from dash import html, dcc, callback_context, Patch
+from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
+from price_store import get_history
+from indicator_cache import IndicatorCache
+import single_flight
+from single_flight import SingleFlight
+from downsampling import downsample_view, visible_bars, visible_range, is_reset
+from render_mode import timing_store, register_render_timing
+from stock_figures import calculate_rsi, calculate_moving_averages, build_traces, build_figure, figure_skeleton
+from figure_encoding import encode_figure, compact_trace
+from live_feed import LIVE_WINDOW, POLL_INTERVAL, start_session, poll_session, stop_session
 
-# Initialize the Dash app
-app = dash.Dash(__name__)
+# Initialize the Dash app; responses are gzip-compressed
+app = dash.Dash(__name__, compress=True)
 
 # Prevent the default development server from running on 8050
 app.config.suppress_callback_exceptions = True
 
+# Cache of computed indicators, keyed by ticker, period and last bar
+indicator_cache = IndicatorCache()
+
+# Concurrent requests for the same indicators share one computation
+indicator_flight = SingleFlight('indicators')
+
 # Default stock tickers
 STOCK_TICKERS = [
     'AAPL', 'MSFT', 'GOOGL', 'AMZN', 'META',
     'TSLA', 'NVDA', 'JPM', 'BAC', 'WMT'
 ]
 
+# Trace attributes that carry data; a Patch replaces only these
+TRACE_DATA_ATTRIBUTES = ('x', 'y', 'open', 'high', 'low', 'close')
+
+# Indicator lines in trace order, after the candlestick at index 0
+LINE_NAMES = ['20 MA', '60 MA', '200 MA', 'RSI']
+
 # Time periods
 TIME_PERIODS = [
     {'label': '1 Month', 'value': '1mo'},
@@ -30,28 +46,11 @@ TIME_PERIODS = [
     {'label': '5 Years', 'value': '5y'}
 ]
 
-def calculate_rsi(data, periods=14):
-    """Calculate RSI for a given price series"""
-    close_delta = data['Close'].diff()
-    
-    # Make two series: one for lower closes and one for higher closes
-    up = close_delta.clip(lower=0)
-    down = -1 * close_delta.clip(upper=0)
-    
-    # Calculate the EWMA
-    ma_up = up.ewm(com=periods - 1, adjust=True, min_periods=periods).mean()
-    ma_down = down.ewm(com=periods - 1, adjust=True, min_periods=periods).mean()
-    
-    rsi = ma_up / ma_down
-    rsi = 100 - (100/(1 + rsi))
-    return rsi
-
-def calculate_moving_averages(data):
-    """Calculate moving averages for the price data"""
-    ma20 = data['Close'].rolling(window=20).mean()
-    ma60 = data['Close'].rolling(window=60).mean()
-    ma200 = data['Close'].rolling(window=200).mean()
-    return ma20, ma60, ma200
+def get_indicators(ticker_symbol, period, hist):
+    """Return RSI and moving averages for a history, served from the cache when possible"""
+    key = IndicatorCache.make_key('indicators', ticker_symbol, period, hist)
+    return indicator_flight.do(key, lambda: indicator_cache.get_or_compute(
+        key, lambda: (calculate_rsi(hist), *calculate_moving_averages(hist))))
 
 # App layout
 app.layout = html.Div([
@@ -93,6 +92,15 @@ app.layout = html.Div([
                 value='1y',
                 style={'width': '150px'}
             ),
+        ], style={'marginRight': '20px', 'display': 'inline-block'}),
+
+        # Live mode toggle
+        html.Div([
+            dcc.Checklist(
+                id='live-toggle',
+                options=[{'label': ' Live', 'value': 'live'}],
+                value=[]
+            ),
         ], style={'display': 'inline-block'}),
     ], style={'textAlign': 'center', 'marginBottom': '20px'}),
     
@@ -101,140 +109,171 @@ app.layout = html.Div([
              style={'color': 'red', 'textAlign': 'center', 'marginTop': '10px'}),
     
     # Graph
-    dcc.Graph(id='stock-graph')
+    dcc.Graph(id='stock-graph'),
+    timing_store('stock-graph'),
+
+    # Trace structure of the figure on the client, so callbacks can send a Patch
+    dcc.Store(id='figure-skeleton'),
+
+    # Live mode: poll timer, server-side session id and the pending indicator update
+    dcc.Interval(id='live-interval', interval=POLL_INTERVAL, disabled=True),
+    dcc.Store(id='live-session'),
+    dcc.Store(id='live-lines')
 ], style={'padding': '20px', 'backgroundColor': 'white'})
 
+def patch_figure(ticker_symbol, traces):
+    """Build a Patch that swaps in new trace data and title, keeping the client's layout"""
+    patched = Patch()
+    for i, (trace, _) in enumerate(traces):
+        data = compact_trace(trace.to_plotly_json())
+        for attribute in TRACE_DATA_ATTRIBUTES:
+            if attribute in data:
+                patched['data'][i][attribute] = data[attribute]
+    patched['layout']['title']['text'] = f'{ticker_symbol} Stock Price and RSI'
+    return patched
+
+def live_figure(ticker_symbol, session_id, bars, lines):
+    """Build the figure live mode starts from: the last window of bars as SVG
+    traces, so extendData can append to the candlestick and each line"""
+    traces = build_traces(bars[['Open', 'High', 'Low', 'Close']], lines, mode='svg')
+    fig = build_figure(ticker_symbol, traces)
+    fig.update_layout(uirevision=f'{ticker_symbol}:live:{session_id}')
+    return fig, figure_skeleton(traces)
+
 @app.callback(
     [Output('stock-graph', 'figure'),
-     Output('error-message', 'children')],
+     Output('error-message', 'children'),
+     Output('figure-skeleton', 'data'),
+     Output('live-interval', 'disabled'),
+     Output('live-session', 'data')],
     [Input('stock-ticker-dropdown', 'value'),
      Input('custom-ticker-input', 'value'),
-     Input('time-period-dropdown', 'value')]
+     Input('time-period-dropdown', 'value'),
+     Input('stock-graph', 'relayoutData'),
+     Input('live-toggle', 'value')],
+    [State('figure-skeleton', 'data'),
+     State('live-session', 'data')]
 )
-def update_graph(selected_ticker, custom_ticker, period):
+def update_graph(selected_ticker, custom_ticker, period, relayout_data, live, client_skeleton, live_session):
     # Use custom ticker if provided, otherwise use selected ticker
     ticker_symbol = custom_ticker.strip().upper() if custom_ticker else selected_ticker
+
+    # A zoom or pan re-requests full resolution for the visible range only;
+    # other relayout events (autosize, legend clicks) need no new data.
+    # In live mode the client already holds every bar of the window.
+    x_range = None
+    if callback_context.triggered_id == 'stock-graph':
+        x_range = visible_range(relayout_data)
+        if live or (x_range is None and not is_reset(relayout_data)):
+            raise PreventUpdate
+
+    # Any other change ends the current live stream
+    if live_session:
+        stop_session(live_session)
     
     try:
-        # Fetch stock data
-        stock = yf.Ticker(ticker_symbol)
-        hist = stock.history(period=period)
+        if live:
+            # Seed the chart and the incremental indicators, then stream new bars
+            session_id, bars, lines = start_session(ticker_symbol, period=period)
+            fig, skeleton = live_figure(ticker_symbol, session_id, bars, lines)
+            return fig, '', skeleton, False, session_id
+
+        # Fetch stock data from the local store (only new bars are downloaded)
+        hist = get_history(ticker_symbol, period=period)
         
         if hist.empty:
-            return {}, f"No data found for ticker {ticker_symbol}"
-        
-        # Calculate RSI and Moving Averages
-        rsi = calculate_rsi(hist)
-        ma20, ma60, ma200 = calculate_moving_averages(hist)
+            return {}, f"No data found for ticker {ticker_symbol}", None, True, None
         
-        # Create subplot with secondary y-axis
-        fig = make_subplots(rows=2, cols=1, 
-                           shared_xaxes=True,
-                           vertical_spacing=0.03,
-                           row_heights=[0.7, 0.3])
-
-        # Add candlestick chart
-        fig.add_trace(
-            go.Candlestick(
-                x=hist.index,
-                open=hist['Open'],
-                high=hist['High'],
-                low=hist['Low'],
-                close=hist['Close'],
-                name='Price',
-                increasing_line_color='#26a69a',
-                decreasing_line_color='#ef5350'
-            ),
-            row=1, col=1
-        )
-
-        # Add Moving Averages
-        fig.add_trace(
-            go.Scatter(
-                x=hist.index,
-                y=ma20,
-                name='20 MA',
-                line=dict(color='#1976D2', width=1.5)
-            ),
-            row=1, col=1
-        )
-
-        fig.add_trace(
-            go.Scatter(
-                x=hist.index,
-                y=ma60,
-                name='60 MA',
-                line=dict(color='#FB8C00', width=1.5)
-            ),
-            row=1, col=1
-        )
-
-        fig.add_trace(
-            go.Scatter(
-                x=hist.index,
-                y=ma200,
-                name='200 MA',
-                line=dict(color='#E91E63', width=1.5)
-            ),
-            row=1, col=1
-        )
-        # Set RSI y-axis range from 0 to 100
-        fig.update_yaxes(range=[0, 100], row=2, col=1)
-        # Add border frame to RSI subplot
-        fig.update_xaxes(showline=True, linewidth=5, linecolor='#2c3e50', row=2, col=1)
-        fig.update_yaxes(showline=True, linewidth=5, linecolor='#2c3e50', row=2, col=1)
-        fig.update_layout(
-            xaxis_showgrid=True,
-            yaxis_showgrid=True,
-            xaxis_zeroline=False,
-            yaxis_zeroline=False,
-            plot_bgcolor='grey'
-        )
-        # Add RSI
-        fig.add_trace(
-            go.Scatter(
-                x=hist.index,
-                y=rsi,
-                name='RSI',
-                line=dict(color='#2962ff', width=2)
-            ),
-            row=2, col=1
-        )
+        # Calculate RSI and Moving Averages (cached until a new bar arrives)
+        rsi, ma20, ma60, ma200 = get_indicators(ticker_symbol, period, hist)
 
-        # Add RSI overbought/oversold lines
-        fig.add_hline(y=70, line_color='#ef5350', line_dash='dash', row=2, col=1)
-        fig.add_hline(y=30, line_color='#26a69a', line_dash='dash', row=2, col=1)
-        
-        # Update layout
-        fig.update_layout(
-            title=f'{ticker_symbol} Stock Price and RSI',
-            yaxis_title='Stock Price (USD)',
-            yaxis2_title='RSI',
-            template='plotly_white',
-            xaxis_rangeslider_visible=False,
-            height=800,
-            showlegend=True,
-            plot_bgcolor='white',
-            paper_bgcolor='white',
-            font=dict(color='#2c3e50'),
-            legend=dict(
-                yanchor="top",
-                y=0.99,
-                xanchor="left",
-                x=0.01,
-                bgcolor='rgba(255, 255, 255, 0.8)'
-            )
-        )
-
-        # Update y-axes labels and styling
-        fig.update_yaxes(title_text="Price", row=1, col=1, gridcolor='#eee')
-        fig.update_yaxes(title_text="RSI", row=2, col=1, gridcolor='#eee')
-        fig.update_xaxes(gridcolor='#eee')
+        # Downsample to what the chart can show: bucketed candles and LTTB lines
+        candles, lines = downsample_view(
+            hist, {'20 MA': ma20, '60 MA': ma60, '200 MA': ma200, 'RSI': rsi}, x_range)
+        in_view = visible_bars(hist, x_range)
+        traces = build_traces(candles, lines, n_points=len(hist) if in_view is None else int(in_view.sum()))
+        skeleton = figure_skeleton(traces)
+
+        # Keep the user's zoom across the updates that relayoutData triggers
+        uirevision = f'{ticker_symbol}:{period}'
+
+        if skeleton == client_skeleton:
+            # The client already has this layout: send only trace data and title
+            patched = patch_figure(ticker_symbol, traces)
+            patched['layout']['uirevision'] = uirevision
+            for axis in ('xaxis', 'xaxis2'):
+                if x_range is not None:
+                    patched['layout'][axis]['range'] = list(x_range)
+                else:
+                    patched['layout'][axis]['autorange'] = True
+            return patched, '', dash.no_update, True, None
+
+        fig = build_figure(ticker_symbol, traces)
+        fig.update_layout(uirevision=uirevision)
+        if x_range is not None:
+            fig.update_xaxes(range=list(x_range))
         
-        return fig, ''
+        return encode_figure(fig), '', skeleton, True, None
         
     except Exception as e:
-        return {}, f"Error fetching data for {ticker_symbol}. Please check the ticker symbol."
+        return {}, f"Error fetching data for {ticker_symbol}. Please check the ticker symbol.", None, True, None
+
+@app.callback(
+    [Output('stock-graph', 'extendData'),
+     Output('live-lines', 'data')],
+    [Input('live-interval', 'n_intervals')],
+    [State('live-session', 'data')],
+    prevent_initial_call=True
+)
+def stream_bars(n_intervals, live_session):
+    """Append the bars that arrived since the last poll, sliding the window"""
+    polled = poll_session(live_session) if live_session else None
+    if polled is None:
+        raise PreventUpdate
+
+    bars, lines = polled
+    if bars.empty:
+        raise PreventUpdate
+
+    # extendTraces needs the same attributes on every trace it extends, so
+    # the candlestick goes first and the indicator lines follow via live-lines
+    x = list(bars.index)
+    candles = {
+        'x': [x],
+        'open': [bars['Open'].tolist()],
+        'high': [bars['High'].tolist()],
+        'low': [bars['Low'].tolist()],
+        'close': [bars['Close'].tolist()]
+    }
+    indicator_lines = {
+        'x': [x] * len(LINE_NAMES),
+        'y': [lines[name].tolist() for name in LINE_NAMES]
+    }
+    line_indices = list(range(1, len(LINE_NAMES) + 1))
+    return [candles, [0], LIVE_WINDOW], [indicator_lines, line_indices, LIVE_WINDOW]
+
+# Second extendData for the same poll, applied in the browser
+app.clientside_callback(
+    """
+    function(update) {
+        return update || window.dash_clientside.no_update;
+    }
+    """,
+    Output('stock-graph', 'extendData', allow_duplicate=True),
+    Input('live-lines', 'data'),
+    prevent_initial_call=True
+)
+
+# Report client render time per figure to /render-timings
+register_render_timing(app, 'stock-graph')
+
+@app.server.route('/cache-stats')
+def cache_stats():
+    return indicator_cache.stats()
+
+@app.server.route('/coalesce-stats')
+def coalesce_stats():
+    return single_flight.stats()
 
 if __name__ == '__main__':
     app.run(host='127.0.0.1', port=12355, debug=True) 
\ No newline at end of file
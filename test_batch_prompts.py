@@ -0,0 +1,102 @@
+import json
+import asyncio
+import pytest
+import batch_prompts
+from batch_prompts import BatchRunner, RateLimiter, completed_lines, main
+from llm_client import LLMClient
+from mock_openai_server import start_mock_server
+
+# The batch runner against a local mock OpenAI-compatible server: results
+# are written as they arrive, a rerun resumes after an interruption, and
+# the concurrency setting is the number of requests in flight. The rate
+# limits are checked on a fake clock, so they don't depend on timing.
+
+
+def write_prompts(path, count):
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(count):
+            f.write(json.dumps({'request_id': f'req-{i:03d}', 'title': f'Prompt {i}', 'body': f'Question {i}'}) + '\n')
+
+
+def runner(server, concurrency, **limits):
+    llm = LLMClient(api_key='test', base_url=server.base_url, max_in_flight=concurrency, max_connections=concurrency)
+    return BatchRunner(llm, RateLimiter(**limits), concurrency=concurrency, model='mock', progress=False)
+
+
+def read_results(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_resumes_after_interruption(tmp_path):
+    server = start_mock_server(first_token_latency=0.01, token_delay=0, echo=True)
+    prompts, output = tmp_path / 'prompts.jsonl', tmp_path / 'out.jsonl'
+    write_prompts(prompts, 50)
+
+    # Stop part way, leaving half a record behind as a kill would
+    asyncio.run(runner(server, 4).run(str(prompts), str(output), limit=20))
+    with open(output, 'a', encoding='utf-8') as f:
+        f.write('{"line": 30, "id": "req-0')
+    assert len(completed_lines(str(output))) == 20
+
+    summary = asyncio.run(runner(server, 4).run(str(prompts), str(output)))
+    assert (summary['answered'], summary['done_earlier']) == (30, 20)
+    results = read_results(output)
+    assert sorted(r['line'] for r in results) == list(range(50))
+    assert all(r['reply'] == f"Question {r['line']}" and r['id'] == f"req-{r['line']:03d}" for r in results)
+
+    # Nothing left to do
+    assert main([str(prompts), '-o', str(output), '--base-url', server.base_url]) == 0
+    assert server.stats.snapshot()['requests'] == 50
+
+
+def test_concurrency_sets_requests_in_flight(tmp_path):
+    server = start_mock_server(first_token_latency=0.1, token_delay=0)
+    prompts = tmp_path / 'prompts.jsonl'
+    write_prompts(prompts, 40)
+
+    asyncio.run(runner(server, 1).run(str(prompts), str(tmp_path / 'out-1.jsonl')))
+    assert server.stats.snapshot()['max_in_flight'] == 1
+    summary = asyncio.run(runner(server, 8).run(str(prompts), str(tmp_path / 'out-8.jsonl')))
+    assert summary['answered'] == 40
+    assert server.stats.snapshot()['max_in_flight'] == 8
+
+
+class FakeClock:
+    """time.monotonic and asyncio.sleep on a clock that only moves when slept on"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        # Like a real timer, never less than its resolution
+        self.now += max(seconds, 1e-6)
+
+
+def limiter_time(monkeypatch, limits, acquires):
+    """Seconds of (fake) waiting for a list of acquire(tokens) calls on RateLimiter(**limits)"""
+    clock = FakeClock()
+    # Only the limiter's view of time: the event loop keeps the real clock
+    monkeypatch.setattr(batch_prompts, 'time', clock)
+    monkeypatch.setattr(asyncio, 'sleep', clock.sleep)
+    limiter = RateLimiter(**limits)
+
+    async def spend():
+        for tokens in acquires:
+            await limiter.acquire(tokens)
+
+    asyncio.run(spend())
+    return clock.now
+
+
+def test_request_limit(monkeypatch):
+    # One second's burst of 10, then the other 30 at 10 per second
+    assert limiter_time(monkeypatch, dict(requests_per_second=10), [0] * 40) == pytest.approx(3.0, abs=0.01)
+
+
+def test_token_limit(monkeypatch):
+    # 6000 tokens of burst, then 100 tokens/s
+    assert limiter_time(monkeypatch, dict(tokens_per_minute=6000), [1000] * 7) == pytest.approx(10.0, abs=0.01)
@@ -0,0 +1,75 @@
+from chat_context import ContextWindow, SUMMARY_TOKENS, count_tokens, message_tokens, window_slides
+
+# The context window over a long synthetic chat: prompt tokens must stop
+# growing once the window starts sliding, and the summary must only be
+# recomputed when it slides.
+
+RECENT_TOKENS = 1000
+
+
+def chat(turns):
+    history = []
+    for i in range(turns):
+        history.append({'type': 'user', 'content': f"Question {i}: " + "how does the indicator behave " * 8,
+                        'timestamp': ''})
+        history.append({'type': 'bot', 'content': f"Answer {i}: " + "it smooths the closing prices " * 20,
+                        'timestamp': ''})
+    return history
+
+
+class FakeSummarizer:
+    def __init__(self, fail=False):
+        self.calls = 0
+        self.fail = fail
+
+    def __call__(self, summary, turns):
+        self.calls += 1
+        if self.fail:
+            return None
+        # A summary of bounded size, like the model's (max_tokens=SUMMARY_TOKENS)
+        return (f"{summary or ''} [{len(turns)} turns]")[-SUMMARY_TOKENS * 3:]
+
+
+def prompt_tokens(messages):
+    return sum(count_tokens(m['content']) + 4 for m in messages)
+
+
+def test_prompt_tokens_plateau(tmp_path):
+    summarize = FakeSummarizer()
+    window = ContextWindow(summarize, recent_tokens=RECENT_TOKENS, cache_dir=str(tmp_path))
+    history = chat(200)
+    sizes = []
+    for turn in range(200):
+        messages = window.build_messages("What next?", history[:2 * turn])
+        sizes.append(prompt_tokens(messages))
+
+    assert messages[0]['role'] == 'system'
+    assert messages[1]['content'].startswith('Summary of the earlier conversation')
+    # Recent turns are verbatim, the newest last, and the window starts at a user turn
+    assert messages[-2]['content'] == history[2 * 199 - 1]['content']
+    assert messages[2]['role'] == 'user'
+    # Flat after the first slides, far below the full history
+    assert max(sizes[50:]) <= RECENT_TOKENS + SUMMARY_TOKENS * 2
+    assert max(sizes[50:]) - min(sizes[50:]) < RECENT_TOKENS
+    assert sum(message_tokens(m) for m in history) > 20 * max(sizes)
+    # One summary per slide, not one per turn
+    assert summarize.calls == len(window_slides(history[:2 * 199], RECENT_TOKENS))
+    assert summarize.calls < 200 / 3
+
+
+def test_summaries_are_shared_and_failures_keep_turns(tmp_path):
+    history = chat(40)
+    first = ContextWindow(FakeSummarizer(), recent_tokens=RECENT_TOKENS, cache_dir=str(tmp_path / 'a'))
+    expected = first.build_messages("What next?", history)
+
+    # Another process with the same cache finds every summary already made
+    summarize = FakeSummarizer()
+    second = ContextWindow(summarize, recent_tokens=RECENT_TOKENS, cache_dir=str(tmp_path / 'a'))
+    assert second.build_messages("What next?", history) == expected
+    assert summarize.calls == 0
+
+    # Without a summary nothing is dropped: the turns go out verbatim
+    failing = ContextWindow(FakeSummarizer(fail=True), recent_tokens=RECENT_TOKENS, cache_dir=str(tmp_path / 'b'))
+    messages = failing.build_messages("What next?", history)
+    assert len(messages) == len(history) + 2
+
@@ -0,0 +1,75 @@
+from llm_client import LLMClient
+from conversation_store import ConversationStore, new_conversation_id
+from mock_openai_server import start_mock_server
+
+# Streaming replies against a local mock OpenAI-compatible server: the
+# first text must reach the caller while the server is still sending the
+# rest of the completion, not after it.
+
+FIRST_TOKEN_LATENCY = 0.3
+TOKEN_DELAY = 0.05
+
+
+def mock_client(chatbot, monkeypatch):
+    # The chatbot fixture starts from an empty response cache, so every reply really streams from the server
+    server = start_mock_server(first_token_latency=FIRST_TOKEN_LATENCY, token_delay=TOKEN_DELAY)
+    monkeypatch.setattr(chatbot, 'llm', LLMClient(api_key='test', base_url=server.base_url))
+    return server
+
+
+def test_stream_yields_text_before_the_reply_is_complete(chatbot, monkeypatch):
+    server = mock_client(chatbot, monkeypatch)
+    texts = []
+    for text in chatbot.stream_bot_response('Explain RSI', []):
+        if not texts:
+            assert server.stats.snapshot()['in_flight'] == 1
+        texts.append(text)
+
+    assert texts[-1].startswith('Sure.')
+    assert len(texts) > 2
+    # Each yield is the text so far, growing with every delta
+    assert all(later.startswith(earlier) and len(later) > len(earlier) for earlier, later in zip(texts, texts[1:]))
+
+
+def test_update_chat_messages_pushes_partial_text(chatbot, monkeypatch):
+    server = mock_client(chatbot, monkeypatch)
+    conversation_id = new_conversation_id()
+    message = {'type': 'user', 'content': 'Explain RSI', 'timestamp': '2025-01-01 00:00:00'}
+    chatbot.conversation_store.append(conversation_id, message)
+    pushes = []
+
+    def set_progress(progress):
+        bot_message = progress[0].children[0].children
+        pushes.append((bot_message, server.stats.snapshot()['in_flight']))
+
+    patch, stream = chatbot.update_chat_messages(
+        set_progress, {'conversation_id': conversation_id, 'message': message})
+    final = patch.to_plotly_json()['operations'][0]['params']['value']
+
+    assert pushes[0][0] == 'Typing...'
+    partial = pushes[1:]
+    assert len(partial) > 2
+    # The first partial text went out while the server was still streaming
+    assert partial[0][1] == 1
+    assert len(partial[0][0]) < len(partial[-1][0])
+    assert stream is None
+    assert final.children[0].children.startswith(partial[-1][0])
+    # The finished reply is saved after the question it answers
+    saved = chatbot.conversation_store.messages(conversation_id)
+    assert [m['type'] for m in saved] == ['user', 'bot']
+    assert saved[1]['content'] == final.children[0].children
+
+
+def test_conversation_store_reads_only_new_lines(tmp_path):
+    writer = ConversationStore(str(tmp_path))
+    reader = ConversationStore(str(tmp_path))
+    conversation_id = new_conversation_id()
+    for i in range(3):
+        writer.append(conversation_id, {'type': 'user', 'content': f'message {i}', 'timestamp': ''})
+    assert [m['content'] for m in reader.messages(conversation_id)] == ['message 0', 'message 1', 'message 2']
+
+    # A write from another process shows up on the next read, on top of the parsed prefix
+    writer.append(conversation_id, {'type': 'bot', 'content': 'reply', 'timestamp': ''})
+    assert [m['content'] for m in reader.messages(conversation_id)][-2:] == ['message 2', 'reply']
+    assert reader.messages(new_conversation_id()) == []
+
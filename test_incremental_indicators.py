@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+from stock_figures import calculate_rsi, calculate_moving_averages
+from incremental_indicators import IncrementalRSI, IncrementalMovingAverages, save_state, load_state
+
+
+def make_prices(n=600, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    return pd.DataFrame({'Close': close}, index=pd.bdate_range('2020-01-01', periods=n))
+
+
+def test_rsi_matches_batch():
+    data = make_prices()
+    rsi = IncrementalRSI(14)
+    streamed = np.concatenate([rsi.update_many(data['Close'][:400]),
+                               [rsi.update(close) for close in data['Close'][400:]]])
+    np.testing.assert_allclose(streamed, calculate_rsi(data).to_numpy(), rtol=1e-9, equal_nan=True)
+
+
+def test_moving_averages_match_batch():
+    data = make_prices()
+    averages = IncrementalMovingAverages()
+    streamed = averages.update_many(data['Close'])
+    for ours, theirs in zip(streamed, calculate_moving_averages(data)):
+        np.testing.assert_allclose(ours, theirs.to_numpy(), rtol=1e-9, equal_nan=True)
+
+
+def test_snapshot_restore_continues_stream(tmp_path):
+    data = make_prices()
+    indicators = {'rsi': IncrementalRSI(14), 'ma': IncrementalMovingAverages()}
+    indicators['rsi'].update_many(data['Close'][:500])
+    indicators['ma'].update_many(data['Close'][:500])
+
+    path = str(tmp_path / 'state.json')
+    save_state(indicators, path)
+    restored = load_state(path)
+
+    rsi = restored['rsi'].update_many(data['Close'][500:])
+    ma20, ma60, ma200 = restored['ma'].update_many(data['Close'][500:])
+    np.testing.assert_allclose(rsi, calculate_rsi(data).to_numpy()[500:], rtol=1e-9)
+    np.testing.assert_allclose(ma200, calculate_moving_averages(data)[2].to_numpy()[500:], rtol=1e-9)
@@ -0,0 +1,68 @@
+import asyncio
+import threading
+from llm_client import LLMClient
+from mock_openai_server import start_mock_server
+
+# The shared client against a local mock OpenAI-compatible server: rejected
+# requests are retried, and concurrent requests never exceed the in-flight
+# cap or open more connections than it allows.
+
+MESSAGES = [{'role': 'user', 'content': 'Explain RSI'}]
+
+
+def client_threads():
+    # The mock server runs a thread per connection; leave those out
+    return sum('process_request' not in thread.name for thread in threading.enumerate())
+
+
+def test_retries_rate_limited_requests():
+    server = start_mock_server(first_token_latency=0.01, token_delay=0, fail_first=2, retry_after=0)
+    llm = LLMClient(api_key='test', base_url=server.base_url)
+
+    completion = llm.create_sync(MESSAGES, model='mock')
+    assert completion.choices[0].message.content.startswith('Sure.')
+    assert llm.stats()['retries'] == 2
+    assert server.stats.snapshot()['failed'] == 2
+
+    # Streams are retried too, as long as no text has been sent; fail_first
+    # counts every request seen, so 5 rejects the next two
+    server.config.fail_first = 5
+    text = ''.join(llm.stream_sync(MESSAGES, model='mock'))
+    assert text.startswith('Sure.')
+    assert llm.stats()['retries'] == 4
+    assert server.stats.snapshot()['failed'] == 4
+
+
+def test_gives_up_on_client_errors(chatbot, monkeypatch):
+    server = start_mock_server(first_token_latency=0, token_delay=0, fail_rate=1.0, fail_status=400)
+    llm = LLMClient(api_key='test', base_url=server.base_url)
+    monkeypatch.setattr(chatbot, 'llm', llm)
+
+    reply = chatbot.get_bot_response('Explain RSI', [])
+    assert reply.startswith('Error:')
+    assert llm.stats()['retries'] == 0
+    assert server.stats.snapshot()['failed'] == 1
+
+
+def test_concurrency_is_capped():
+    server = start_mock_server(first_token_latency=0.1, token_delay=0)
+    llm = LLMClient(api_key='test', base_url=server.base_url, max_in_flight=8, max_connections=8)
+    threads_before = client_threads()
+
+    async def burst():
+        return await asyncio.gather(*(llm.create(MESSAGES, model='mock') for _ in range(64)))
+
+    completions = asyncio.run(burst())
+    stats = server.stats.snapshot()
+    assert len(completions) == 64
+    assert stats['max_in_flight'] <= 8
+    assert stats['connections'] <= 8
+    # The loop thread, plus resolver threads for new connections at most
+    assert client_threads() - threads_before <= 1 + 8
+
+    # A second burst reuses the pooled connections and starts no threads
+    threads_before = client_threads()
+    asyncio.run(burst())
+    assert server.stats.snapshot()['connections'] == stats['connections']
+    assert client_threads() == threads_before
+
@@ -0,0 +1,40 @@
+import json
+import urllib.request
+from llm_client import LLMClient
+from mock_openai_server import start_mock_server
+from response_cache import ResponseCache
+
+# Repeated prompts against a local mock OpenAI-compatible server: the
+# second ask must be answered from the cache, without an API call.
+
+
+def server_requests(server):
+    with urllib.request.urlopen(server.base_url.replace('/v1', '/stats')) as response:
+        return json.load(response)['requests']
+
+
+def test_repeated_prompt_is_served_from_cache(chatbot, monkeypatch):
+    server = start_mock_server(first_token_latency=0.3, token_delay=0.01)
+    monkeypatch.setattr(chatbot, 'llm', LLMClient(api_key='test', base_url=server.base_url))
+
+    first = chatbot.get_bot_response('Explain RSI', [])
+    # Same prompt up to whitespace, through the streaming path this time
+    second = list(chatbot.stream_bot_response('  Explain   RSI ', []))
+
+    # Answered in one piece, without a second request to the server
+    assert second == [first]
+    assert server_requests(server) == 1
+    stats = chatbot.response_cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+    assert stats['hit_rate'] == 0.5
+
+
+def test_sampled_replies_can_opt_out(tmp_path):
+    cache = ResponseCache(str(tmp_path), cache_sampled=False)
+    messages = [{'role': 'user', 'content': 'What is Henry Hub?'}]
+    cache.set(messages, 'sampled', model='deepseek-chat', temperature=0.7)
+    cache.set(messages, 'greedy', model='deepseek-chat', temperature=0)
+    assert cache.get(messages, model='deepseek-chat', temperature=0.7) is None
+    assert cache.get(messages, model='DeepSeek-Chat ', temperature=0.0) == 'greedy'
+    assert cache.stats()['skipped'] == 1
+
@@ -0,0 +1,97 @@
+import os
+import html
+import threading
+import importlib
+
+# Single entry point for every Dash app in the repo. Each app stays its own
+# module and is mounted under a path prefix; a module (and whatever it
+# imports) is only loaded on the first request to its prefix, so a worker
+# that only ever serves the maps never imports yfinance or openai.
+#
+#   development:  python wsgi.py
+#   production:   gunicorn -c gunicorn.conf.py wsgi:application
+
+# (path prefix, module, title) for every app
+PAGES = [
+    ('stocks', 'stock_visualization', 'Stock Price Visualizer'),
+    ('dashboard', 'stock-price-dashboard', 'Multi-Stock Price Dashboard'),
+    ('gas', 'gas_hub_map', 'Natural Gas Trading Hubs Map'),
+    ('oil', 'oil_market_map', 'Global Oil Markets Map'),
+    ('temperature', 'us_temperature_map', 'US Temperature Map'),
+    ('chat', 'deepseek_chatbot', 'DeepSeek Chatbot'),
+    ('express', 'test_plotly_express', 'Plotly Express Chart Gallery'),
+]
+
+# Dash reads its request prefix from this variable when an app is created
+PREFIX_VAR = 'DASH_REQUESTS_PATHNAME_PREFIX'
+
+
+class LazyDispatcher:
+    """WSGI app that imports each Dash app on first use and routes by prefix"""
+
+    def __init__(self, pages):
+        self.pages = {prefix: (module, title) for prefix, module, title in pages}
+        self._servers = {}
+        self._lock = threading.Lock()
+
+    def load(self, prefix):
+        """Import the app behind a prefix, once per process, and return its Flask server"""
+        server = self._servers.get(prefix)
+        if server is not None:
+            return server
+        with self._lock:
+            if prefix not in self._servers:
+                # Routes stay at '/' because the prefix is stripped below;
+                # the browser must still request them under the prefix
+                previous = os.environ.get(PREFIX_VAR)
+                os.environ[PREFIX_VAR] = f'/{prefix}/'
+                try:
+                    module = importlib.import_module(self.pages[prefix][0])
+                finally:
+                    if previous is None:
+                        os.environ.pop(PREFIX_VAR, None)
+                    else:
+                        os.environ[PREFIX_VAR] = previous
+                # Dash hands callbacks registered with dash.callback to the
+                # first app that serves a request; claim them for this app
+                # now, before another lazily loaded app can take them
+                module.app._setup_server()
+                self._servers[prefix] = module.app.server
+            return self._servers[prefix]
+
+    def index(self, environ, start_response):
+        if environ.get('PATH_INFO', '/') not in ('', '/'):
+            start_response('404 Not Found', [('Content-Type', 'text/plain; charset=utf-8')])
+            return [b'Not Found']
+        links = '\n'.join(f'<li><a href="{prefix}/">{html.escape(title)}</a></li>'
+                          for prefix, (_, title) in self.pages.items())
+        body = (f'<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>Dashboards</title></head>\n'
+                f'<body style="font-family: sans-serif; padding: 20px">'
+                f'<h1>Dashboards</h1>\n<ul>\n{links}\n</ul></body></html>\n').encode('utf-8')
+        start_response('200 OK', [('Content-Type', 'text/html; charset=utf-8'),
+                                  ('Content-Length', str(len(body)))])
+        return [body]
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        prefix = path.lstrip('/').split('/', 1)[0]
+        if prefix not in self.pages:
+            return self.index(environ, start_response)
+        if path == f'/{prefix}':
+            start_response('301 Moved Permanently', [('Location', f"{environ.get('SCRIPT_NAME', '')}/{prefix}/")])
+            return [b'']
+
+        server = self.load(prefix)
+        environ = dict(environ)
+        environ['SCRIPT_NAME'] = f"{environ.get('SCRIPT_NAME', '')}/{prefix}"
+        environ['PATH_INFO'] = path[len(prefix) + 1:]
+        return server(environ, start_response)
+
+
+application = LazyDispatcher(PAGES)
+
+
+if __name__ == '__main__':
+    from werkzeug.serving import run_simple
+    run_simple(os.environ.get('HOST', '127.0.0.1'), int(os.environ.get('PORT', 8050)), application,
+               threaded=True, use_reloader=False, use_debugger=False)